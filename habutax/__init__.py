@@ -2,28 +2,32 @@ __version__ = '0.2.1'
 
 import argparse
 import configparser
+import json
 from pathlib import Path
 import sys
+import tracemalloc
 
+from habutax import discover
 from habutax import enum
 from habutax import fields
 from habutax import form
 from habutax import forms
 from habutax import inputs
+from habutax import memory
+from habutax import optimize
 from habutax import pdf_fields
 from habutax import pdf_filler
+from habutax import profiling
 from habutax import solver
+from habutax import tracing
 from habutax import values
 
-def prompt_input(missing, needed_by):
-    """
-    Given `missing`, an Input which the solver identified as being needed but
-    not supplied, prompt the user to supply it. `needed_by` is a list of the
-    Field objects which need the input.
-    """
-
-    # Prompt the user to input missing input value
-    prompt = f'\n----[ {missing.name()} ]----'
+def _describe_missing_input(missing, needed_by, title=None):
+    """Return the text describing the missing Input `missing` (and why it is
+    needed by the Fields in `needed_by`) shown when prompting for it"""
+    if title is None:
+        title = missing.name()
+    prompt = f'\n----[ {title} ]----'
     prompt += '-' * max(0, (80 - len(prompt))) + '\n'
 
     # Provide context for why this question is being asked
@@ -44,9 +48,11 @@ def prompt_input(missing, needed_by):
     format_suggestion = missing.format_suggestion()
     if len(format_suggestion) > 0:
         prompt += format_suggestion + '\n'
+    return prompt
 
-    prompt += f'(Ctrl-C to abort): '
-
+def _read_input(missing, prompt):
+    """Read a valid value for the Input `missing` from the user, returning
+    None if they abort with Ctrl-C"""
     value = None
 
     while value is None or not missing.valid(value):
@@ -55,19 +61,97 @@ def prompt_input(missing, needed_by):
                 prompt = "Invalid input, try again?: "
             value = input(prompt)
         except KeyboardInterrupt:
-            return (None, False)
+            return None
+
+    return value
+
+def prompt_input(missing, needed_by):
+    """
+    Given `missing`, an Input which the solver identified as being needed but
+    not supplied, prompt the user to supply it. `needed_by` is a list of the
+    Field objects which need the input.
+    """
+    prompt = _describe_missing_input(missing, needed_by)
+    prompt += f'(Ctrl-C to abort): '
 
-    return (value, True)
+    value = _read_input(missing, prompt)
+    return (value, value is not None)
+
+def prompt_inputs(missing):
+    """
+    Prompt the user for all of the inputs the solver currently needs as a
+    single questionnaire. `missing` is a list of (Input, needed_by) tuples.
+    Returns a dict mapping the names of the inputs the user answered to their
+    values (those after any Ctrl-C are left unanswered).
+    """
+    print(f'\n{len(missing)} input(s) are needed to continue (Ctrl-C to stop answering):')
+    for missing_input, _ in missing:
+        print(f' * {missing_input.name()}')
+
+    answers = {}
+    for number, (missing_input, needed_by) in enumerate(missing, 1):
+        prompt = _describe_missing_input(missing_input, needed_by, title=f'{number}/{len(missing)}: {missing_input.name()}')
+        value = _read_input(missing_input, prompt + '> ')
+        if value is None:
+            break
+        answers[missing_input.name()] = value
+    return answers
+
+def print_failure_reasons(s):
+    unimplemented_fields = s.unimplemented_fields()
+    unmet_input_dependencies = s.unmet_input_dependencies()
+    unmet_field_dependencies = s.unmet_field_dependencies()
+
+    if len(unimplemented_fields) > 0:
+        print("\nThe following fields encountered unimplemented behavior:")
+        for unimplemented in unimplemented_fields:
+            print(f'- {unimplemented}')
+    if len(unmet_input_dependencies) > 0:
+        print("\nThe following inputs were needed but not supplied:")
+        for dependency, dependents in unmet_input_dependencies.items():
+            print(f'{dependency} (needed by: {", ".join(dependents)})')
+    if len(unmet_field_dependencies) > 0:
+        print("\nThe following fields were needed but unable to be produced (likely due to unsupplied inputs or unimplemented behavior above):")
+        for dependency, dependents in unmet_field_dependencies.items():
+            print(f'{dependency} (needed by: {", ".join(dependents)})')
+
+def print_progress(solved, outstanding):
+    print(f'\rSolved {solved} fields, {outstanding} outstanding', end='', file=sys.stderr, flush=True)
 
 def solve(args):
     if args.writeback_input:
         Path(args.input_file).touch() # Ensure the input file exists (this allows writing back without the user having to manually touch it first)
 
-    input_store = inputs.InputStore(args.input_file)
-    prompt_fn = prompt_input if args.prompt_missing else None
-    s = solver.Solver(input_store, forms.available_forms[args.year], prompt=prompt_fn)
+    if args.memory_report:
+        tracemalloc.start()
+    tracer = tracing.Tracer() if args.trace else None
+    with tracing.span(tracer, args.input_file, 'inputs'):
+        input_store = inputs.InputStore(args.input_file)
+    prompt_fn = prompt_input if args.prompt_missing and not args.questionnaire else None
+    batch_prompt_fn = prompt_inputs if args.questionnaire else None
+    solver_class = solver.PullSolver if args.engine == 'pull' else solver.Solver
+    s = solver_class(input_store, forms.available_forms[args.year], prompt=prompt_fn, batch_prompt=batch_prompt_fn)
+    if tracer is not None:
+        tracer.attach(s)
+    warm_start = None
+    if args.dependency_cache:
+        warm_start = solver.load_dependency_cache(args.dependency_cache)
+    profiler = None
+    if args.profile or args.profile_output:
+        profiler = profiling.Profiler()
+        s.set_profiler(profiler)
+    solve_args = {
+        'fail_fast': args.fail_fast,
+        'time_budget': args.time_budget,
+        'max_attempts': args.max_attempts,
+        'progress': print_progress if args.progress else None,
+    }
     try:
-        successful = s.solve(args.forms)
+        with tracing.span(tracer, 'solve', 'solver'):
+            if args.plan_cache:
+                successful = solver.PlanCache(args.plan_cache).solve(s, args.forms, **solve_args)
+            else:
+                successful = s.solve(args.forms, warm_start=warm_start, **solve_args)
         solution = s.solution()
     except Exception as e:
         raise e
@@ -76,6 +160,10 @@ def solve(args):
         # entered is saved as they requested
         if args.writeback_input:
             input_store.write(args.input_file)
+        if args.progress:
+            print(file=sys.stderr)
+        if tracer is not None:
+            tracer.write(args.trace)
 
     # Attach tax year to solution
     solution['habutax'] = {
@@ -84,26 +172,34 @@ def solve(args):
     }
 
     if successful:
+        if args.dependency_cache:
+            s.save_dependency_cache(args.dependency_cache)
         print("\nSuccessfully solved!")
+    elif s.blocked_by() is not None:
+        blocked_by = s.blocked_by()
+        print(f'\nStopped solving early: {blocked_by.message}')
+        needed_by = s.unmet_input_dependencies().get(getattr(blocked_by, 'input_name', None))
+        if needed_by:
+            print(f'(needed by: {", ".join(needed_by)})')
     else:
         print("\nFailed to solve, because...")
-
-        unimplemented_fields = s.unimplemented_fields()
-        unmet_input_dependencies = s.unmet_input_dependencies()
-        unmet_field_dependencies = s.unmet_field_dependencies()
-
-        if len(unimplemented_fields) > 0:
-            print("\nThe following fields encountered unimplemented behavior:")
-            for unimplemented in unimplemented_fields:
-                print(f'- {unimplemented}')
-        if len(unmet_input_dependencies) > 0:
-            print("\nThe following inputs were needed but not supplied:")
-            for dependency, dependents in unmet_input_dependencies.items():
-                print(f'{dependency} (needed by: {", ".join(dependents)})')
-        if len(unmet_field_dependencies) > 0:
-            print("\nThe following fields were needed but unable to be produced (likely due to unsupplied inputs or unimplemented behavior above):")
-            for dependency, dependents in unmet_field_dependencies.items():
-                print(f'{dependency} (needed by: {", ".join(dependents)})')
+        print_failure_reasons(s)
+
+    if args.stats:
+        print("\nSolver statistics:")
+        print(json.dumps(s.stats(), sort_keys=True))
+
+    if args.profile:
+        profiler.report(top=args.profile_top)
+    if args.profile_output:
+        if args.profile_format == 'collapsed':
+            profiler.write_collapsed(args.profile_output)
+        else:
+            profiler.write_pstats(args.profile_output)
+        print(f'\nProfile written to {args.profile_output}')
+    if args.memory_report:
+        memory.report(s)
+        tracemalloc.stop()
 
     if not args.solution:
         class StringWriter(object):
@@ -122,6 +218,67 @@ def solve(args):
             solution.write(outfile)
         print(f'\nSolver results written to {args.solution}')
 
+def query(args):
+    input_store = inputs.InputStore(args.input_file)
+    prompt_fn = prompt_input if args.prompt_missing and not args.questionnaire else None
+    batch_prompt_fn = prompt_inputs if args.questionnaire else None
+    solver_class = solver.PullSolver if args.engine == 'pull' else solver.Solver
+    s = solver_class(input_store, forms.available_forms[args.year], prompt=prompt_fn, batch_prompt=batch_prompt_fn)
+    try:
+        results = s.query(args.fields)
+    finally:
+        if args.writeback_input:
+            input_store.write(args.input_file)
+
+    field_map = {f.name(): f for f_form in s.forms.values() for f in f_form.fields()}
+    for field_name in args.fields:
+        if field_name in results:
+            print(f'{field_name} = {field_map[field_name].to_string(results[field_name])}')
+
+    if len(results) < len(args.fields):
+        print("\nFailed to solve some fields, because...")
+        print_failure_reasons(s)
+        sys.exit(1)
+
+def optimize_elections(args):
+    input_store = inputs.InputStore(args.input_file)
+    solver_class = solver.PullSolver if args.engine == 'pull' else solver.Solver
+    elections = args.elections if args.elections else optimize.ELECTIONS
+    outcomes = optimize.optimize(input_store, forms.available_forms[args.year], args.forms, elections=elections, solver_class=solver_class)
+
+    def describe(outcome):
+        choices = ", ".join([f'{e} = {v}' for e, v in outcome.choices.items()])
+        return choices if choices else "(no elections were needed)"
+
+    solved = [o for o in outcomes if o.solved]
+    unsolved = [o for o in outcomes if not o.solved]
+
+    if len(solved) > 0:
+        best = solved[0]
+        print(f'Lowest total tax: {best.total_tax():.2f}')
+        print(f'    {describe(best)}')
+        for field_name, tax in best.taxes.items():
+            print(f'    {field_name} = {tax:.2f}')
+        if len(solved) > 1:
+            print("\nRunners-up:")
+            for n, outcome in enumerate(solved[1:args.top], start=2):
+                difference = outcome.total_tax() - best.total_tax()
+                print(f'{n}. {outcome.total_tax():.2f} (+{difference:.2f}): {describe(outcome)}')
+
+    if len(unsolved) > 0:
+        print("\nThe following combinations of elections could not be solved:")
+        for outcome in unsolved:
+            print(f'- {describe(outcome)}')
+            missing = outcome.solver.unmet_input_dependencies()
+            if len(missing) > 0:
+                print(f'    missing inputs: {", ".join(missing.keys())}')
+            unimplemented = outcome.solver.unimplemented_fields()
+            if len(unimplemented) > 0:
+                print(f'    unimplemented fields: {", ".join(unimplemented)}')
+
+    if len(solved) == 0:
+        sys.exit(1)
+
 def fill_pdfs(args):
     solution = configparser.ConfigParser()
     with open(args.solution) as solution_file:
@@ -132,8 +289,13 @@ def fill_pdfs(args):
     # form data to be filled
     solution.remove_section('habutax')
 
-    p = pdf_filler.PDFFiller(solution, forms.available_forms[tax_year], args.output, flatten=args.flatten)
-    p.fill()
+    tracer = tracing.Tracer() if args.trace else None
+    p = pdf_filler.PDFFiller(solution, forms.available_forms[tax_year], args.output, flatten=args.flatten, tracer=tracer)
+    try:
+        p.fill()
+    finally:
+        if tracer is not None:
+            tracer.write(args.trace)
 
 def list_forms(args):
     header_printed = False
@@ -178,11 +340,16 @@ def list_form_inputs(args):
             print(f'Form "{form_name}" requires a form instance be specified and that it be one of {instances}. For example, try "{form_name}:{form_class.valid_instances[0]}".')
             sys.exit(1)
 
-    f = form_class(instance=form_instance)
+    f = form_class.create(instance=form_instance)
+    print_input_template(f, f.inputs())
+
+def print_input_template(f, form_inputs, input_store=None):
+    """Print a section of an input file for the form `f`, with a commented-out
+    entry for each of `form_inputs`, or its value if it is in `input_store`"""
     print(f'[{f.name()}]')
     print(f'# {f.full_description()}')
 
-    input_map = {i.name(): i for i in f.inputs()}
+    input_map = {i.name(): i for i in form_inputs}
     sorted_inputs = sorted(input_map.keys(), key=solver.sort_keys)
 
     for input_name in sorted_inputs:
@@ -192,7 +359,61 @@ def list_form_inputs(args):
         if len(format_suggestion) > 0:
             comment += format_suggestion
         print('\n' + comment.replace('\n', '\n# '))
-        print(f'#{form_input.base_name()} =')
+        if input_store is not None and input_name in input_store:
+            print(f'{form_input.base_name()} = {input_store.config.get(form_input.section(), form_input.base_name(), raw=True)}')
+        else:
+            print(f'#{form_input.base_name()} =')
+
+def discover_form_inputs(args):
+    input_store = inputs.InputStore(args.input_file)
+    discovered = discover.discover_inputs(input_store, forms.available_forms[args.year], args.forms)
+
+    sections = {}
+    for input_name, form_input in discovered.items():
+        if args.missing_only and input_name in input_store:
+            continue
+        sections.setdefault(form_input.section(), []).append(form_input)
+
+    for n, form_inputs in enumerate(sections.values()):
+        if n > 0:
+            print()
+        print_input_template(form_inputs[0].form(), form_inputs, input_store)
+
+def dump_dependency_graph(args):
+    year_forms = getattr(forms, f'ty{args.year}')
+    graph = year_forms.dependency_graph
+
+    form_names = graph.forms()
+    if args.forms:
+        unknown = [f for f in args.forms if f not in form_names]
+        if unknown:
+            print(f'Cannot find form(s) {", ".join(unknown)}. The `list-forms` sub-command will list the valid form names.')
+            sys.exit(1)
+        form_names = args.forms
+
+    if args.json:
+        graph_dict = graph.to_dict()
+        print(json.dumps({f: graph_dict[f] for f in form_names}, indent=2))
+    else:
+        for form_name in form_names:
+            print(f'{form_name}: {", ".join(sorted(graph.form_dependencies(form_name)))}')
+            if args.fields:
+                for field in graph.fields(form_name):
+                    deps = graph.reads(field)
+                    dynamic = ' (+ dynamic reads)' if deps.dynamic else ''
+                    print(f'    {field}: {", ".join(sorted(deps.values | deps.inputs))}{dynamic}')
+
+    if args.check:
+        problems = 0
+        for cycle in graph.cycles():
+            problems += 1
+            print(f'Cycle: {" -> ".join(cycle)}')
+        for field, key in graph.dangling():
+            if field.partition('.')[0] in form_names:
+                problems += 1
+                print(f'Dangling reference: {field} reads {key}, which is not defined by any form')
+        if problems:
+            sys.exit(1)
 
 def version(args):
     print(f'HabuTax v{__version__}')
@@ -214,13 +435,50 @@ def main():
     )
     solve_parser.add_argument('--form', dest='forms', action='append', help='Which form(s) you want to calculate')
     solve_parser.add_argument('--prompt-missing', action='store_true', default=False, help='Interactively prompt for any missing input')
+    solve_parser.add_argument('--questionnaire', action='store_true', default=False, help='Like --prompt-missing, but ask for all of the inputs currently known to be missing together, one page at a time')
     solve_parser.add_argument('--writeback-input', action='store_true', default=False, help='Write any interactively-supplied input back to the config file when done (loses any comments/formatting present in file)')
     solve_parser.add_argument('--solution', type=str, default=None, help='Output text file for the results of the tax solver (defaults to stdout)')
+    solve_parser.add_argument('--dependency-cache', type=str, default=None, help='File in which to cache the forms and field order discovered by a successful solve, used to speed up later solves of returns with the same forms and shape of inputs')
+    solve_parser.add_argument('--plan-cache', type=str, default=None, help='Directory in which to cache the solve plans (forms and field order) of successful solves, one per shape of inputs, and from which to follow any matching plan to speed up solving')
+    solve_parser.add_argument('--fail-fast', action='store_true', default=False, help='Stop solving as soon as it cannot succeed (i.e. a field is unimplemented, or an input is missing and not supplied), reporting only the reason why')
+    solve_parser.add_argument('--time-budget', type=float, default=None, help='Stop solving once it has taken this many seconds')
+    solve_parser.add_argument('--max-attempts', type=int, default=None, help='Stop solving once it has made this many field attempts')
+    solve_parser.add_argument('--progress', action='store_true', default=False, help='Report the number of fields solved and outstanding (on stderr) while solving')
+    solve_parser.add_argument('--stats', action='store_true', default=False, help='Print counters describing the work done by the solver (attempts, retries, forms created, time taken, etc.) as a line of JSON')
+    solve_parser.add_argument('--profile', action='store_true', default=False, help='Print the fields and forms which took the longest to evaluate, and how many attempts and exceptions each needed')
+    solve_parser.add_argument('--profile-top', type=int, default=20, help='How many fields and forms --profile lists (default: 20)')
+    solve_parser.add_argument('--profile-output', type=str, default=None, help='File to write the per-field profile to, for use with other profiling tools')
+    solve_parser.add_argument('--profile-format', choices=['pstats', 'collapsed'], default='pstats', help='Format of --profile-output: "pstats" for pstats/snakeviz/gprof2dot, or "collapsed" stacks for flame graph tools (default: pstats)')
+    solve_parser.add_argument('--memory-report', action='store_true', default=False, help='Print how much memory is retained by each form instance, the inputs, the solved values, and the solver\'s dependency tracking once solved, where it was allocated, and the peak memory use')
+    solve_parser.add_argument('--trace', type=str, default=None, help='File to write a timeline of the forms added, field attempts, and prompts made while solving to, in the Trace Event Format read by Perfetto and chrome://tracing')
+    solve_parser.add_argument('--engine', choices=['retry', 'pull'], default='retry', help='How fields are solved: "retry" attempts each field in turn, re-attempting it once any unsolved fields it needs are solved, while "pull" solves any unsolved fields a field needs immediately (default: retry)')
     solve_parser.set_defaults(func=solve)
 
+    # query argument setup
+    query_parser = subparsers.add_parser('query', help='Calculate only the value of specific fields (and those they depend on), rather than entire forms')
+    query_parser.add_argument('input_file', type=str, help='The file containing your input for the tax forms you are calculating.')
+    query_parser.add_argument('--year', choices=forms.available_forms.keys(), type=int, default=default_year, help=f'The tax year to use (default: {default_year})')
+    query_parser.add_argument('--field', dest='fields', action='append', required=True, help='Which field(s) you want to calculate (i.e. "1040.24")')
+    query_parser.add_argument('--prompt-missing', action='store_true', default=False, help='Interactively prompt for any missing input')
+    query_parser.add_argument('--questionnaire', action='store_true', default=False, help='Like --prompt-missing, but ask for all of the inputs currently known to be missing together, one page at a time')
+    query_parser.add_argument('--writeback-input', action='store_true', default=False, help='Write any interactively-supplied input back to the config file when done (loses any comments/formatting present in file)')
+    query_parser.add_argument('--engine', choices=['retry', 'pull'], default='pull', help='How fields are solved (see `solve --help`, default: pull)')
+    query_parser.set_defaults(func=query)
+
+    # optimize argument setup
+    optimize_parser = subparsers.add_parser('optimize', help='Find the values of election inputs (i.e. whether to itemize) which result in the lowest total tax')
+    optimize_parser.add_argument('input_file', type=str, help='The file containing your input for the tax forms you are calculating (any values it contains for the elections are ignored)')
+    optimize_parser.add_argument('--year', choices=forms.available_forms.keys(), type=int, default=default_year, help=f'The tax year to use (default: {default_year})')
+    optimize_parser.add_argument('--form', dest='forms', action='append', required=True, help='Which form(s) you want to calculate')
+    optimize_parser.add_argument('--election', dest='elections', action='append', help=f'A boolean or enum input to optimize (default: {", ".join(optimize.ELECTIONS)})')
+    optimize_parser.add_argument('--top', type=int, default=5, help='How many of the best combinations of elections to display (default: 5)')
+    optimize_parser.add_argument('--engine', choices=['retry', 'pull'], default='retry', help='How fields are solved (see `solve --help`, default: retry)')
+    optimize_parser.set_defaults(func=optimize_elections)
+
     # fill-pdfs argument setup
     fill_pdfs_parser = subparsers.add_parser('fill-pdfs', help='Fill PDFs using a solution previously calculated using HabuTax')
     fill_pdfs_parser.add_argument('--no-flatten', dest='flatten', action='store_false', default=True, help='Do not "flatten" the PDF after filling, so its fields can still be edited')
+    fill_pdfs_parser.add_argument('--trace', type=str, default=None, help='File to write a timeline of each form read and pdftk run to, in the Trace Event Format read by Perfetto and chrome://tracing')
     fill_pdfs_parser.add_argument('solution', type=str, help='The file containing the solution of the tax forms you want to generate PDFs of.')
     fill_pdfs_parser.add_argument('output', type=str, help='Path where you want to write the generated PDF file')
     fill_pdfs_parser.set_defaults(func=fill_pdfs)
@@ -238,6 +496,23 @@ def main():
     list_form_inputs_parser.add_argument('--year', type=int, default=default_year, help=f'The tax year to use (default: {default_year})')
     list_form_inputs_parser.set_defaults(func=list_form_inputs)
 
+    # discover-inputs argument setup
+    discover_inputs_parser = subparsers.add_parser('discover-inputs', help='List every input solving the given forms may need, given those already supplied, in a format suitable for editing and passing as input to HabuTax')
+    discover_inputs_parser.add_argument('input_file', type=str, help='The file containing any inputs you have already supplied for the tax forms you are calculating')
+    discover_inputs_parser.add_argument('--year', choices=forms.available_forms.keys(), type=int, default=default_year, help=f'The tax year to use (default: {default_year})')
+    discover_inputs_parser.add_argument('--form', dest='forms', action='append', required=True, help='Which form(s) you want to calculate')
+    discover_inputs_parser.add_argument('--missing-only', action='store_true', default=False, help='Only list the inputs which have not been supplied')
+    discover_inputs_parser.set_defaults(func=discover_form_inputs)
+
+    # dependency-graph argument setup
+    dependency_graph_parser = subparsers.add_parser('dependency-graph', help='Print the dependencies between forms (and optionally fields), as determined by statically analyzing the form definitions')
+    dependency_graph_parser.add_argument('--year', type=int, choices=forms.available_forms.keys(), default=default_year, help=f'The tax year to use (default: {default_year})')
+    dependency_graph_parser.add_argument('--form', dest='forms', action='append', help='Only print the dependencies of these form(s)')
+    dependency_graph_parser.add_argument('--fields', action='store_true', default=False, help='Also print the inputs and values read by each field')
+    dependency_graph_parser.add_argument('--json', action='store_true', default=False, help='Print the full graph as JSON')
+    dependency_graph_parser.add_argument('--check', action='store_true', default=False, help='Report any dependency cycles or references to undefined fields or inputs, exiting with an error if there are any')
+    dependency_graph_parser.set_defaults(func=dump_dependency_graph)
+
     version_parser = subparsers.add_parser('version', help='Display current HabuTax version.')
     version_parser.set_defaults(func=version)
 
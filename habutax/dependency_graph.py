@@ -0,0 +1,314 @@
+import ast
+from fnmatch import fnmatchcase
+import inspect
+import textwrap
+import warnings
+
+from habutax import fields
+from habutax import inputs
+from habutax.form import InputForm
+
+_field_types = {name for name, cls in vars(fields).items() if isinstance(cls, type) and issubclass(cls, fields.Field)}
+_input_types = {name for name, cls in vars(inputs).items() if isinstance(cls, type) and issubclass(cls, inputs.Input)}
+
+
+def _key_pattern(node):
+    """Return the key used by a subscript or field/input constructor if it is
+    a string literal or an f-string (with each interpolated part replaced by
+    '*'), or None if it cannot be determined statically"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    elif isinstance(node, ast.JoinedStr):
+        pattern = ""
+        for part in node.values:
+            if isinstance(part, ast.Constant):
+                pattern += str(part.value)
+            else:
+                pattern += '*'
+        return pattern
+    return None
+
+
+def _full_key(form_name, key):
+    """Resolve `key`, which may be relative to `form_name`, to a full key with
+    any form instance removed (i.e. 'w-2:{n}.box_1' becomes 'w-2.box_1'). The
+    graph describes form classes, not individual instances. Returns None if
+    the form of the key cannot be determined statically."""
+    if key is None or key == '*':
+        return None
+    if "." not in key:
+        return f'{form_name}.{key}'
+    key_form, _, key_name = key.partition('.')
+    key_form = key_form.split(':')[0]
+    if '*' in key_form:
+        return None
+    return f'{key_form}.{key_name}'
+
+
+class FieldDependencies(object):
+    """The inputs and values statically read by one field's value function.
+    `dynamic` is set if some read could not be determined from the source
+    (i.e. `v[key]` where `key` is a variable), in which case the sets may be
+    incomplete."""
+
+    def __init__(self):
+        self.inputs = set()
+        self.values = set()
+        self.dynamic = False
+
+
+class DependencyGraph(object):
+    """A dependency graph between the fields of a list of form classes (i.e.
+    all the forms for one tax year), built by walking the syntax tree of each
+    form's `__init__` rather than by running the solver.
+
+    Field value functions almost always read their dependencies as literal
+    `v['...']`/`i['...']` subscripts, or as f-strings like
+    `v[f'w-2:{n}.box_1']`. Each interpolated part of an f-string is treated as
+    a wildcard, and form instances are ignored, so nodes are named like
+    `w-2.box_1` and `w-2.box_12*_code`. Reads through helper functions defined
+    in the same `__init__` are followed."""
+
+    def __init__(self, form_list):
+        self._form_names = []
+        self._inputs = {}
+        self._fields = {}
+
+        for form_class in form_list:
+            self._add_form(form_class)
+
+        self._resolved = {}
+        self._edges = {}
+        for field in self.fields():
+            self._edges[field] = set()
+            for key in self._field_dependencies(field).values:
+                self._edges[field].update(self._resolve(key, self._fields))
+        self._reverse_edges = {field: set() for field in self._edges}
+        for field, deps in self._edges.items():
+            for dep in deps:
+                self._reverse_edges[dep].add(field)
+
+    def _add_form(self, form_class):
+        form_name = form_class.form_name
+        self._form_names.append(form_name)
+        self._inputs[form_name] = set()
+        self._fields[form_name] = {}
+
+        source = textwrap.dedent(inspect.getsource(form_class))
+        with warnings.catch_warnings():
+            # Any warnings about the source were already issued on import
+            warnings.simplefilter('ignore', SyntaxWarning)
+            warnings.simplefilter('ignore', DeprecationWarning)
+            class_def = ast.parse(source).body[0]
+        init = None
+        for node in class_def.body:
+            if isinstance(node, ast.FunctionDef) and node.name == '__init__':
+                init = node
+        if init is None:
+            return
+
+        local_functions = {}
+        for node in ast.walk(init):
+            if isinstance(node, ast.FunctionDef) and node is not init:
+                local_functions.setdefault(node.name, []).append(node)
+
+        for node in ast.walk(init):
+            if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name) or len(node.args) == 0:
+                continue
+            if node.func.id in _input_types:
+                name = _full_key(form_name, _key_pattern(node.args[0]))
+                if name is not None:
+                    self._inputs[form_name].add(name)
+            elif node.func.id in _field_types:
+                name = _full_key(form_name, _key_pattern(node.args[0])) or f'{form_name}.*'
+                deps = self._fields[form_name].setdefault(name, FieldDependencies())
+                value_fn = node.args[-1] if len(node.args) > 1 else None
+                for kw in node.keywords:
+                    if kw.arg == 'value_fn':
+                        value_fn = kw.value
+                if isinstance(value_fn, ast.Lambda):
+                    self._add_reads(form_name, value_fn, local_functions, deps, set())
+                elif isinstance(value_fn, ast.Name) and value_fn.id in local_functions:
+                    for fn in local_functions[value_fn.id]:
+                        self._add_reads(form_name, fn, local_functions, deps, set())
+                else:
+                    deps.dynamic = True
+
+        # InputForm creates one field per input, which simply returns it
+        if issubclass(form_class, InputForm):
+            for name in self._inputs[form_name]:
+                deps = self._fields[form_name].setdefault(name, FieldDependencies())
+                deps.inputs.add(name)
+
+    def _add_reads(self, form_name, fn, local_functions, deps, seen):
+        """Add the reads made by `fn` (a lambda or function definition taking
+        `(self, inputs, values, ...)`) and any local functions it calls to
+        `deps`"""
+        seen.add(fn)
+        params = [a.arg for a in fn.args.args]
+        roles = {}
+        if len(params) > 1:
+            roles[params[1]] = deps.inputs
+        if len(params) > 2:
+            roles[params[2]] = deps.values
+
+        for node in ast.walk(fn):
+            if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id in roles:
+                # Before Python 3.9, the subscript is wrapped in an ast.Index
+                slice_node = node.slice.value if isinstance(node.slice, getattr(ast, 'Index', ())) else node.slice
+                key = _full_key(form_name, _key_pattern(slice_node))
+                if key is None:
+                    deps.dynamic = True
+                else:
+                    roles[node.value.id].add(key)
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in local_functions:
+                for called in local_functions[node.func.id]:
+                    if called not in seen:
+                        self._add_reads(form_name, called, local_functions, deps, seen)
+
+    def _resolve(self, key, names_by_form):
+        """Return the names in `names_by_form` which `key` may refer to. Both
+        may contain wildcards."""
+        cache_key = (key, names_by_form is self._fields)
+        if cache_key not in self._resolved:
+            key_form = key.partition('.')[0]
+            self._resolved[cache_key] = {name for name in names_by_form.get(key_form, ())
+                                         if fnmatchcase(key, name) or fnmatchcase(name, key)}
+        return self._resolved[cache_key]
+
+    def forms(self):
+        return list(self._form_names)
+
+    def fields(self, form_name=None):
+        """Return the names of all fields, or only those of `form_name`"""
+        if form_name is not None:
+            return list(self._fields[form_name])
+        return [field for form in self._form_names for field in self._fields[form]]
+
+    def inputs(self, form_name=None):
+        if form_name is not None:
+            return sorted(self._inputs[form_name])
+        return [i for form in self._form_names for i in sorted(self._inputs[form])]
+
+    def _field_dependencies(self, field):
+        form_name = field.partition('.')[0]
+        return self._fields[form_name][field]
+
+    def reads(self, field):
+        """Return the FieldDependencies (the input and value keys, as written
+        in the source) of `field`"""
+        return self._field_dependencies(field)
+
+    def dependencies(self, field):
+        """Return the set of fields `field` may depend on"""
+        return set(self._edges[field])
+
+    def dependents(self, field):
+        """Return the set of fields which may depend on `field`"""
+        return set(self._reverse_edges[field])
+
+    def form_dependencies(self, form_name):
+        """Return the set of other forms whose fields or inputs `form_name`'s
+        fields may read"""
+        deps = set()
+        for field in self._fields[form_name].values():
+            for key in field.inputs | field.values:
+                deps.add(key.partition('.')[0])
+        deps.discard(form_name)
+        return deps
+
+    def dangling(self):
+        """Return a list of (field, key) for all reads which cannot refer to
+        any known field or input"""
+        dangling = []
+        for field in self.fields():
+            deps = self._field_dependencies(field)
+            for key in sorted(deps.values):
+                if not self._resolve(key, self._fields):
+                    dangling.append((field, key))
+            for key in sorted(deps.inputs):
+                if not self._resolve(key, self._inputs):
+                    dangling.append((field, key))
+        return dangling
+
+    def cycles(self):
+        """Return a list of dependency cycles, each as a list of fields (the
+        strongly-connected components of more than one field, or of one field
+        depending on itself)"""
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        cycles = []
+
+        for root in self.fields():
+            if root in index:
+                continue
+            # Iterative version of Tarjan's algorithm
+            work = [(root, iter(sorted(self._edges[root])))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(self._edges[child]))))
+                        break
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.remove(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or node in self._edges[node]:
+                            cycles.append(sorted(component))
+        return cycles
+
+    def order(self):
+        """Return all fields ordered so that each comes after the fields it
+        may depend on (as far as possible, if there are cycles)"""
+        remaining = {field: len(deps - {field}) for field, deps in self._edges.items()}
+        ready = [field for field in self.fields() if remaining[field] == 0]
+        ordered = []
+        while ready:
+            field = ready.pop()
+            ordered.append(field)
+            for dependent in self._reverse_edges[field]:
+                if dependent == field:
+                    continue
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        placed = set(ordered)
+        ordered += [field for field in self.fields() if field not in placed]
+        return ordered
+
+    def to_dict(self):
+        """Return the graph as a JSON-serializable dict"""
+        graph = {}
+        for form_name in self._form_names:
+            graph[form_name] = {
+                'depends_on': sorted(self.form_dependencies(form_name)),
+                'inputs': self.inputs(form_name),
+                'fields': {},
+            }
+            for name, deps in self._fields[form_name].items():
+                graph[form_name]['fields'][name] = {
+                    'inputs': sorted(deps.inputs),
+                    'values': sorted(deps.values),
+                    'dynamic': deps.dynamic,
+                }
+        return graph
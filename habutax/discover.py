@@ -0,0 +1,135 @@
+from habutax import inputs
+from habutax.solver import Solver, sort_keys
+
+# Values tried, in order, to stand in for missing inputs which don't gate any
+# further questions (so that the fields reading them can be solved, and any
+# inputs they read after them discovered). Inputs for which none of these is
+# valid are left missing.
+STAND_IN_VALUES = ['1', 'x', '123-45-6789']
+
+
+def branch_values(missing):
+    """Return the (string) values of the Input `missing` to explore, one
+    branch for each, or None if it doesn't gate any further questions. The
+    first is used when exploring the other inputs."""
+    if isinstance(missing, inputs.BooleanInput):
+        return ['no', 'yes']
+    elif isinstance(missing, inputs.EnumInput):
+        return [member.name for member in missing.enum]
+    return None
+
+
+def stand_in_value(missing):
+    """Return a valid (string) value for the Input `missing`, or None"""
+    for value in STAND_IN_VALUES:
+        if missing.valid(value):
+            return value
+    return None
+
+
+def _discover(solver, discovered):
+    """Add the inputs `solver` read or is waiting for to `discovered` (a dict
+    mapping their names to Input objects), returning how many were new"""
+    found = solver.read_inputs() | set(solver.unmet_input_dependencies())
+    new = found - discovered.keys()
+    for input_name in new:
+        discovered[input_name] = solver.input_spec(input_name)
+    return len(new)
+
+
+def _resolve(solver, updates):
+    """Apply `updates` to `solver` and continue solving, returning False if
+    that needs a form HabuTax doesn't support"""
+    solver.update_inputs(updates)
+    try:
+        solver.resolve()
+    except NotImplementedError:
+        return False
+    return True
+
+
+def _explore_branches(solver, defaults, branches, discovered, branched):
+    """Explore forks of `solver` taking the alternative values in `branches`
+    (a list of {input name: value} dicts), all at once if possible. If that
+    needs an unsupported form, they are split up to find those which don't."""
+    updates = dict(defaults)
+    for branch in branches:
+        updates.update(branch)
+    forked = solver.fork()
+    if not _resolve(forked, updates):
+        if len(branches) > 1:
+            middle = len(branches) // 2
+            _explore_branches(solver, defaults, branches[:middle], discovered, branched)
+            _explore_branches(solver, defaults, branches[middle:], discovered, branched)
+        return
+    if _discover(forked, discovered) > 0:
+        _explore(forked, discovered, set(branched))
+
+
+def _explore(solver, discovered, branched):
+    """
+    Supply each input `solver` is missing and continue solving, adding the
+    inputs found along the way to `discovered`. Missing boolean and enum
+    inputs not in `branched` (those already branched on along this path) are
+    also explored with their other values, in forks which are followed only
+    while they keep finding new inputs. All of the booleans are flipped in one
+    fork, and the enums take their second, third, etc. values together in
+    others, since most of them only gate questions of their own.
+    """
+    defaults = {}
+    flipped = []
+    enum_branches = []
+    for input_name in sorted(solver.unmet_input_dependencies(), key=sort_keys):
+        spec = solver.input_spec(input_name)
+        values = branch_values(spec)
+        if values is None:
+            value = stand_in_value(spec)
+            if value is not None:
+                defaults[input_name] = value
+            continue
+
+        defaults[input_name] = values[0]
+        if input_name in branched:
+            continue
+        branched.add(input_name)
+        if isinstance(spec, inputs.BooleanInput):
+            flipped.append({input_name: values[1]})
+        else:
+            for n, value in enumerate(values[1:]):
+                if n == len(enum_branches):
+                    enum_branches.append([])
+                enum_branches[n].append({input_name: value})
+    if len(defaults) == 0:
+        return
+
+    for branches in [flipped] + enum_branches:
+        if len(branches) > 0:
+            _explore_branches(solver, defaults, branches, discovered, branched)
+    if _resolve(solver, defaults):
+        _discover(solver, discovered)
+        _explore(solver, discovered, branched)
+
+
+def discover_inputs(input_store, form_list, form_names, solver_class=Solver):
+    """
+    Return a dict mapping the names of all the inputs which solving
+    `form_names` may need, given the inputs already in `input_store`, to
+    their Input objects (the input store itself is left unchanged).
+
+    Starting from the inputs supplied, each missing input is given a stand-in
+    value, and solving continued to find the inputs needed next. Missing
+    boolean and enum inputs are branched on, exploring their other values
+    too. Branches are combined and pruned (see _explore()) so that their
+    number grows with the number of such inputs rather than exponentially, at
+    the cost of possibly missing inputs only needed by some combinations of
+    their values. Integer inputs are given the value 1, which for counts such
+    as `1040.number_w-2` causes the inputs of one instance of the counted
+    form to be discovered.
+    """
+    solver = solver_class(input_store.copy(), form_list)
+    solver.solve(form_names)
+
+    discovered = {}
+    _discover(solver, discovered)
+    _explore(solver, discovered, set())
+    return {name: discovered[name] for name in sorted(discovered, key=sort_keys)}
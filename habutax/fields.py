@@ -1,5 +1,3 @@
-from types import MethodType
-
 class FieldNotImplemented(Exception):
     def __init__(self, field_name, message_fmt="Encountered unimplemented tax scenario when processing {field_name}", detailed=None):
         self.field_name = field_name
@@ -9,6 +7,10 @@ class FieldNotImplemented(Exception):
         super().__init__(self.message)
 
 class Field(object):
+    # There are many fields (one per field of each form instance), so they
+    # don't have a __dict__
+    __slots__ = ('_name', '_form')
+
     def __init__(self, name):
         assert "." not in name
         self._name = name
@@ -50,13 +52,16 @@ class Field(object):
         raise NotImplementedError()
 
 class TypedField(Field):
+    __slots__ = ('_value_fn', '_type')
+
     def __init__(self, name, value_fn, _type):
-        self._value = MethodType(value_fn, self)
+        # Called with the field as its first argument, as if it were a method
+        self._value_fn = value_fn
         self._type = _type
         super().__init__(name)
 
     def value(self, inputs, values):
-        v = self._value(inputs, values)
+        v = self._value_fn(self, inputs, values)
         if v is None or isinstance(v, str) and v.strip() == "":
             return self._empty_value
         elif type(v) is not self._type:
@@ -64,6 +69,8 @@ class TypedField(Field):
         return v
 
 class BasicTypedField(TypedField):
+    __slots__ = ()
+
     def to_string(self, value):
         return str(value)
 
@@ -71,26 +78,34 @@ class BasicTypedField(TypedField):
         return self._type(string)
 
 class StringField(BasicTypedField):
+    __slots__ = ()
+    _empty_value = ""
+
     def __init__(self, name, value_fn):
-        self._empty_value = ""
         super().__init__(name, value_fn, str)
 
 class BooleanField(BasicTypedField):
+    __slots__ = ()
+    _empty_value = False
+
     def __init__(self, name, value_fn):
-        self._empty_value = False
         super().__init__(name, value_fn, bool)
 
     def from_string(self, string):
         return string.strip().lower() == 'true'
 
 class IntegerField(BasicTypedField):
+    __slots__ = ()
+    _empty_value = 0
+
     def __init__(self, name, value_fn):
-        self._empty_value = 0
         super().__init__(name, value_fn, int)
 
 class FloatField(BasicTypedField):
+    __slots__ = ('_places',)
+    _empty_value = 0.0
+
     def __init__(self, name, value_fn, places=2):
-        self._empty_value = 0.0
         self._places = places
         super().__init__(name, value_fn, float)
 
@@ -105,8 +120,10 @@ class FloatField(BasicTypedField):
         return round(float(string), self._places)
 
 class EnumField(TypedField):
+    __slots__ = ()
+    _empty_value = None
+
     def __init__(self, name, enum, value_fn):
-        self._empty_value = None
         super().__init__(name, value_fn, enum)
 
     def enum(self):
@@ -1,17 +1,21 @@
 from collections.abc import Mapping
 from enum import IntEnum, auto, unique
+import functools
 
 from habutax.inputs import (StringInput,
                             BooleanInput,
                             IntegerInput,
                             FloatInput,
                             EnumInput,
-                            SSNInput)
+                            SSNInput,
+                            MissingInput,
+                            MissingInputSpecification)
 from habutax.fields import (StringField,
                             BooleanField,
                             IntegerField,
                             FloatField,
                             EnumField)
+from habutax.values import UnmetDependency
 
 
 class AutoNumber(IntEnum):
@@ -78,6 +82,30 @@ class Jurisdiction(AutoNumber):
     WY = auto()
 
 
+@functools.lru_cache(maxsize=None)
+def _copied_slots(cls):
+    """Return the names of the slots of the Input or Field class `cls` which
+    _bind() copies, and whether it also has a __dict__ to copy (if it is a
+    subclass which doesn't declare __slots__)"""
+    slots = [name for c in cls.__mro__ for name in c.__dict__.get('__slots__', ())]
+    return tuple(name for name in slots if name != '_form'), cls.__dictoffset__ != 0
+
+
+def _bind(obj, form):
+    """Return a copy of the Input or Field `obj` associated with `form`
+    instead, which shares everything else (such as its value function) with
+    it"""
+    cls = type(obj)
+    names, has_dict = _copied_slots(cls)
+    bound = object.__new__(cls)
+    for name in names:
+        setattr(bound, name, getattr(obj, name))
+    if has_dict:
+        bound.__dict__.update(obj.__dict__)
+    bound.__form_init__(form)
+    return bound
+
+
 class Form(object):
     def __init__(self,
                  child_cls,
@@ -107,6 +135,42 @@ class Form(object):
         for f in self._required_fields + self._optional_fields:
             f.__form_init__(self)
 
+    @classmethod
+    def create(cls, instance=None, solver=None):
+        """
+        Return a new instance of this form, like calling the class does, but
+        without running its __init__() again each time. The inputs, fields,
+        thresholds and PDF fields a form creates in __init__() depend only on
+        its class (and, for forms listing their `valid_instances`, on which
+        instance it is), so they are created once, by the first call, and
+        shared by every form created this way, along with any other
+        attributes __init__() sets. Each form gets its own copies of the
+        inputs and fields (which know which form they belong to), but these
+        share their enums, value functions, descriptions, etc.
+        """
+        key = instance if hasattr(cls, 'valid_instances') else None
+        specs = cls.__dict__.get('_specs')
+        if specs is None:
+            specs = {}
+            cls._specs = specs
+        if key not in specs:
+            specs[key] = cls(instance=key)
+        form = specs[key].copy(solver)
+        form._instance = instance
+        return form
+
+    def copy(self, solver):
+        """Return a copy of this form belonging to `solver`, with its own
+        copies of its inputs and fields (see create())"""
+        form = self.__class__.__new__(self.__class__)
+        # Includes any attributes (like enums) __init__() set on the form
+        form.__dict__.update(self.__dict__)
+        form._solver = solver
+        form._inputs = [_bind(i, form) for i in self._inputs]
+        form._required_fields = [_bind(f, form) for f in self._required_fields]
+        form._optional_fields = [_bind(f, form) for f in self._optional_fields]
+        return form
+
     def name(self):
         if self._instance is None:
             return self._name
@@ -197,13 +261,19 @@ class InputForm(Form):
 
 
 class FormAccessor(Mapping):
-    def __init__(self, mapping, form):
+    def __init__(self, mapping, form, reads=None):
+        """Provide access to `mapping` relative to `form`. If `reads` is a
+        set, the full name of every key read through this accessor is added
+        to it (whether or not the read succeeds)."""
         self.form = form
         self.mapping = mapping
+        self.reads = reads
 
     def __getitem__(self, key):
         if "." not in key:
             key = f'{self.form.name()}.{key}'
+        if self.reads is not None:
+            self.reads.add(key)
         return self.mapping[key]
 
     def __iter__(self):
@@ -213,6 +283,45 @@ class FormAccessor(Mapping):
         return len(self.mapping)
 
 
+class CollectingAccessor(FormAccessor):
+    """A FormAccessor which, instead of raising UnmetDependency or
+    MissingInput, reports missing keys to a DependencyCollector and returns a
+    Placeholder for them"""
+
+    def __init__(self, mapping, form, collector, reads=None):
+        super().__init__(mapping, form, reads=reads)
+        self.collector = collector
+
+    def __getitem__(self, key):
+        try:
+            return super().__getitem__(key)
+        except UnmetDependency as ud:
+            return self.collector.missing_value(ud.dependency)
+        except MissingInput as mi:
+            return self.collector.missing_input(mi.input_name)
+        except MissingInputSpecification as mis:
+            # Only worth loading the specification if a real evaluation would
+            # need it
+            if not self.collector.branched:
+                raise
+            return self.collector.missing_input(mis.input_name)
+
+
+class PullingAccessor(FormAccessor):
+    """A FormAccessor which, before reading a key missing from `mapping`,
+    calls `pull` with its full name to give it a chance to be produced"""
+
+    def __init__(self, mapping, form, pull, reads=None):
+        super().__init__(mapping, form, reads=reads)
+        self.pull = pull
+
+    def __getitem__(self, key):
+        full_key = key if "." in key else f'{self.form.name()}.{key}'
+        if full_key not in self.mapping:
+            self.pull(full_key)
+        return super().__getitem__(key)
+
+
 def name_and_instance(full_form_name):
     split_form_name = full_form_name.split(':')
     form_instance = None
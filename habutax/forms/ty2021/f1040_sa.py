@@ -49,7 +49,7 @@ class Form1040SA(Form):
             return state_local_income_taxes
 
         def line_8a(self, i, v):
-            mortgage_interest_points = sum([v[f'1098:{n}.box_1'] for n in range(i['1040.number_1098'])])
+            mortgage_interest_points = float(sum([v[f'1098:{n}.box_1'] for n in range(i['1040.number_1098'])]))
             mortgage_interest_points += sum([v[f'1098:{n}.box_6'] for n in range(i['1040.number_1098'])])
             if mortgage_interest_points > 0.001 and i['loan_limitations']:
                 self.not_implemented()
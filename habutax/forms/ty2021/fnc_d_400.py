@@ -114,7 +114,7 @@ class FormNCD400(Form):
             BooleanField('5', lambda s, i, v: i['1040.filing_status'] == enum.filing_status_2021.QualifyingWidowWidower),
             StringField('separate_spouse_name', lambda s, i, v: f'i["1040.first_name"] i["1040.middle_initial"] i["1040.last_name"]'.upper() if v['3'] else None),
             StringField('separate_spouse_ssn', lambda s, i, v: i['1040.spouse_ssn'][:3] + "-" + i['1040.spouse_ssn'][3:5] + "-" + i['1040.spouse_ssn'][5:] if v['3'] else None),
-            StringField('year_spouse_died', lambda s, i, v: i['year_spouse_died'] if v['5'] else None),
+            StringField('year_spouse_died', lambda s, i, v: str(i['year_spouse_died']) if v['5'] else None),
             FloatField('6', lambda s, i, v: v['1040.11'], places=0),
             FloatField('7', lambda s, i, v: v['nc_d-400_ss.15'] if i['additions_to_agi'] else None, places=0),
             FloatField('8', lambda s, i, v: v['6'] + v['7'], places=0),
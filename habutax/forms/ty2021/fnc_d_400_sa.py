@@ -31,7 +31,7 @@ class FormNCD400SA(Form):
             self.not_implemented()
 
         def line_1(self, i, v):
-            mortgage_interest_points = sum([v[f'1098:{n}.box_1'] for n in range(i['1040.number_1098'])])
+            mortgage_interest_points = float(sum([v[f'1098:{n}.box_1'] for n in range(i['1040.number_1098'])]))
             mortgage_interest_points += sum([v[f'1098:{n}.box_6'] for n in range(i['1040.number_1098'])])
             return mortgage_interest_points
 
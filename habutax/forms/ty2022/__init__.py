@@ -47,3 +47,12 @@ available_forms = [
 	FormNCD400SS,
 	FormNCD400SA,
 ]
+
+def __getattr__(name):
+    # The dependency graph is only built when first requested, since doing so
+    # requires parsing the source of every form
+    if name == 'dependency_graph':
+        from habutax.dependency_graph import DependencyGraph
+        globals()['dependency_graph'] = DependencyGraph(available_forms)
+        return globals()['dependency_graph']
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
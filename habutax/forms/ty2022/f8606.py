@@ -56,7 +56,7 @@ class Form8606(Form):
             FloatField('13', lambda s, i, v: v['11'] + v['12']),
             FloatField('14', lambda s, i, v: v['3'] - v['13'] if i['distribution_or_roth_conversion'] else v['3']),
             FloatField('15a', lambda s, i, v: v['7'] - v['12']),
-            FloatField('15b', lambda s, i, v: self.not_implemented() if i['qualified_disaster_distributions'] else None),
+            FloatField('15b', lambda s, i, v: s.not_implemented() if i['qualified_disaster_distributions'] else None),
             FloatField('15c', lambda s, i, v: v['15a'] - v['15b']),
             FloatField('16', lambda s, i, v: i['net_converted']),
             FloatField('17', lambda s, i, v: v['11'] if i['part_1_needed'] else i['converted_cost_basis']),
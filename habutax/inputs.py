@@ -3,6 +3,10 @@ import configparser
 import re
 
 class Input(object):
+    # There are many inputs (one per input of each form instance), so they
+    # don't have a __dict__
+    __slots__ = ('_name', '_description', '_form')
+
     def __init__(self, name, description=None):
         assert "." not in name
         self._name = name
@@ -12,6 +16,9 @@ class Input(object):
         """Called when this Input is associated with a form instance"""
         self._form = form
 
+    def form(self):
+        return self._form
+
     def section(self):
         return self._form.name()
 
@@ -39,6 +46,8 @@ class Input(object):
         return True
 
 class StringInput(Input):
+    __slots__ = ()
+
     def format_suggestion(self):
         return ''
 
@@ -46,6 +55,8 @@ class StringInput(Input):
         return string.strip()
 
 class BooleanInput(Input):
+    __slots__ = ()
+
     def format_suggestion(self):
         return 'Input one of y[es] or n[o]'
 
@@ -58,6 +69,8 @@ class BooleanInput(Input):
         raise ValueError(f'Invalid boolean value: {string}')
 
 class IntegerInput(Input):
+    __slots__ = ()
+
     def format_suggestion(self):
         return "Input must be an integer"
 
@@ -68,6 +81,8 @@ class IntegerInput(Input):
         return int(string)
 
 class FloatInput(Input):
+    __slots__ = ()
+
     def format_suggestion(self):
         return "Input must be a floating point number"
 
@@ -78,6 +93,8 @@ class FloatInput(Input):
         return float(string)
 
 class EnumInput(StringInput):
+    __slots__ = ('enum', 'allow_empty')
+
     def __init__(self, name, enum, allow_empty=False, description=None):
         """
         Create an instance to read/validate an input that can be one of a
@@ -98,7 +115,10 @@ class EnumInput(StringInput):
         super().__form_init__(form)
 
     def __getattr__(self, attribute):
-        return self.enum[attribute]
+        try:
+            return self.enum[attribute]
+        except KeyError:
+            raise AttributeError(attribute) from None
 
     def valid(self, string):
         try:
@@ -122,6 +142,8 @@ class EnumInput(StringInput):
         return self.enum[string]
 
 class RegexInput(StringInput):
+    __slots__ = ('_regex_str', '_regex')
+
     def __init__(self, name, regex, description=""):
         self._regex_str = regex
         self._regex = re.compile(regex)
@@ -139,6 +161,8 @@ class RegexInput(StringInput):
         return bool(self._regex.match(v))
 
 class SSNInput(StringInput):
+    __slots__ = ()
+
     def value(self, string):
         v = super().value(string)
         return v.replace("-", "")
@@ -188,6 +212,18 @@ class InputStore(MutableMapping):
                 self.config.read_file(config_file)
         self.input_specs = input_specs
 
+    def copy(self):
+        """Return a copy of this store (and its inputs), sharing its input
+        specifications"""
+        config = configparser.ConfigParser()
+        config.read_dict(self.to_dict())
+        return InputStore(config, self.input_specs)
+
+    def to_dict(self):
+        """Return the (string) inputs as a dict mapping each section to a dict
+        of its options"""
+        return {section: dict(self.config.items(section, raw=True)) for section in self.config.sections()}
+
     def write(self, filename):
         with open(filename, 'w') as outfile:
             self.config.write(outfile)
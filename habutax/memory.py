@@ -0,0 +1,186 @@
+import gc
+import sys
+import tracemalloc
+import types
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def _code_constants(code, found):
+    """Add the ids of the names and constants in `code` and the code nested
+    in it to `found`"""
+    found.add(id(code.co_name))
+    # Only recorded since Python 3.11
+    qualname = getattr(code, 'co_qualname', None)
+    if qualname is not None:
+        found.add(id(qualname))
+    for const in code.co_consts:
+        found.add(id(const))
+        if isinstance(const, types.CodeType):
+            _code_constants(const, found)
+        elif isinstance(const, (tuple, frozenset)):
+            for item in const:
+                found.add(id(item))
+
+
+def _static_objects():
+    """
+    Return the ids of the objects which are part of the code rather than
+    data retained by any one object: modules, their globals (which includes
+    module-level enums and constants), the attributes of their classes, and
+    the constants in the code of their functions and classes (such as the
+    descriptions passed to Inputs when forms are created).
+    """
+    static = set()
+    for module in list(sys.modules.values()):
+        if module is None:
+            continue
+        static.add(id(module))
+        static.add(id(vars(module)))
+        for obj in list(vars(module).values()):
+            static.add(id(obj))
+            attributes = [obj]
+            if isinstance(obj, type) and obj.__module__ == module.__name__:
+                attributes = list(vars(obj).values())
+                static.update(id(attribute) for attribute in attributes)
+            for fn in attributes:
+                fn = getattr(fn, '__func__', fn)
+                if isinstance(fn, types.FunctionType):
+                    _code_constants(fn.__code__, static)
+    return static
+
+
+def _is_static(obj):
+    """Return True if `obj` is code rather than data: a module, code object,
+    function defined when its module was imported, or class which can be
+    imported (unlike, say, the enums some forms create in their __init__())"""
+    if isinstance(obj, (types.ModuleType, types.CodeType)):
+        return True
+    if isinstance(obj, types.FunctionType):
+        return '<locals>' not in obj.__qualname__
+    if isinstance(obj, type):
+        module = sys.modules.get(obj.__module__)
+        return getattr(module, obj.__qualname__, None) is obj
+    return False
+
+
+def _retained_size(root, seen, stop):
+    """
+    Return the total size of the objects reachable from `root`, not counting
+    any already in `seen` (to which those counted are added) or reachable
+    only through the objects whose ids are in `stop`. Static objects (see
+    _is_static()) are shared by everything, so are neither counted nor
+    followed.
+    """
+    size = 0
+    pending = [root]
+    while len(pending) > 0:
+        obj = pending.pop()
+        if id(obj) in seen or id(obj) in stop:
+            continue
+        seen.add(id(obj))
+        if _is_static(obj):
+            continue
+        size += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return size
+
+
+def component_sizes(solver):
+    """
+    Return a list of (component name, bytes) tuples attributing the memory
+    retained by `solver` to the specs shared by the instances of each form,
+    each form instance, the input store (including
+    its ConfigParser), the value store, the dependency trackers and work
+    queue, the record of what each field read, and the rest of the solver.
+    Memory shared by several components is attributed to the first of them,
+    and that shared by everything (see _static_objects()) to none.
+    """
+    forms = dict(solver._input_only_forms)
+    forms.update(solver.forms)
+    # The inputs, fields, etc. shared by all instances of each form (see
+    # Form.create())
+    specs = {id(form_class): form_class.__dict__['_specs'] for form_class in map(type, forms.values())
+             if '_specs' in form_class.__dict__}
+    components = [('shared form specs', list(specs.values()))]
+    components += [(f'form {name}', [forms[name]]) for name in sorted(forms)]
+    components += [
+        ('InputStore', [solver._i]),
+        ('ValueStore', [solver._v]),
+        ('dependency trackers', [solver._field_dependencies, solver._input_dependencies, solver._unattempted_fields,
+                                 solver._waiting, solver._speculative]),
+        ('field reads', [solver._reads, solver._missing]),
+    ]
+
+    roots = [root for _, component_roots in components for root in component_roots]
+    stop = _static_objects() | {id(solver)} | {id(root) for root in roots}
+    seen = set()
+    sizes = []
+    for name, component_roots in components:
+        size = 0
+        for root in component_roots:
+            stop.discard(id(root))
+            size += _retained_size(root, seen, stop)
+        sizes.append((name, size))
+    stop.discard(id(solver))
+    sizes.append(('solver (other)', _retained_size(solver, seen, stop)))
+    return sizes
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in bytes, or None if
+    it can't be determined"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, but kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _kb(size):
+    return f'{size / 1024:.1f} KB'
+
+
+def report(solver, top=10, file=None):
+    """Print where the memory retained by `solver` is, the top allocation
+    sites (by file) of the memory still allocated, and the peak memory use.
+    tracemalloc must have been tracing since before the solver was created."""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError('tracemalloc is not tracing memory allocations')
+    sizes = component_sizes(solver)
+    by_form = {}
+    for name, size in sizes:
+        if name.startswith('form '):
+            form_name = name[len('form '):].split(':')[0]
+            count, total = by_form.get(form_name, (0, 0))
+            by_form[form_name] = (count + 1, total + size)
+    others = [(name, size) for name, size in sizes if not name.startswith('form ')]
+    retained = sum(size for _, size in sizes)
+
+    print(f'\nMemory retained by the solver: {_kb(retained)}', file=file)
+    rows = sorted(others + [(f'forms: {name} (x{count})', total) for name, (count, total) in by_form.items()],
+                  key=lambda row: -row[1])
+    width = max(len(name) for name, _ in rows)
+    for name, size in rows:
+        print(f'  {name.ljust(width)}  {_kb(size).rjust(10)}', file=file)
+
+    form_rows = sorted([(name, size) for name, size in sizes if name.startswith('form ')], key=lambda row: -row[1])[:top]
+    if len(form_rows) > 0:
+        print('\nLargest form instances:', file=file)
+        width = max(len(name) for name, _ in form_rows)
+        for name, size in form_rows:
+            print(f'  {name.ljust(width)}  {_kb(size).rjust(10)}', file=file)
+
+    print('\nMemory still allocated, by the file which allocated it:', file=file)
+    for stat in tracemalloc.take_snapshot().statistics('filename')[:top]:
+        print(f'  {stat.traceback[0].filename}  {_kb(stat.size)} in {stat.count} blocks', file=file)
+
+    current, peak = tracemalloc.get_traced_memory()
+    print(f'\nTraced memory: {_kb(current)} now, {_kb(peak)} at peak', file=file)
+    rss = peak_rss()
+    if rss is not None:
+        print(f'Peak RSS: {rss / (1024 * 1024):.1f} MB', file=file)
@@ -0,0 +1,83 @@
+from habutax import inputs
+from habutax.solver import Solver
+
+# Inputs which are elections made by the taxpayer, rather than facts about
+# their finances, so that their best values can be computed
+ELECTIONS = [
+    '1040.itemize',
+    '1040_sa.itemize_though_less',
+    'nc_d-400.try_itemizing',
+]
+
+# The fields holding the total tax on each form (when it is solved)
+TOTAL_TAX_FIELDS = [
+    '1040.24',
+    'nc_d-400.19',
+]
+
+
+class Outcome(object):
+    """The result of solving with one combination of elections"""
+
+    def __init__(self, choices, solver, total_tax_fields=TOTAL_TAX_FIELDS):
+        self.choices = choices
+        self.solver = solver
+        self.solved = solver.solved()
+        self.taxes = {}
+        if self.solved:
+            solution = solver.solution()
+            for field_name in total_tax_fields:
+                form_name, field = field_name.split('.')
+                if solution.has_option(form_name, field):
+                    self.taxes[field_name] = float(solution[form_name][field])
+
+    def total_tax(self):
+        return sum(self.taxes.values())
+
+
+def election_values(election):
+    """Return the possible (string) values of the Input `election`"""
+    if isinstance(election, inputs.BooleanInput):
+        return ['yes', 'no']
+    elif isinstance(election, inputs.EnumInput):
+        return [member.name for member in election.enum]
+    raise TypeError(f'Only boolean and enum inputs can be optimized, but {election.name()} is a {type(election).__name__}')
+
+
+def _explore(solver, elections, choices, total_tax_fields):
+    """Recursively fork `solver` for each value of the first of `elections`
+    it is waiting for, yielding an Outcome for each combination"""
+    unmet = solver.unmet_input_dependencies()
+    waiting = [e for e in elections if e in unmet and e not in choices]
+    if len(waiting) == 0:
+        yield Outcome(choices, solver, total_tax_fields)
+        return
+
+    election = waiting[0]
+    for value in election_values(solver.input_spec(election)):
+        forked = solver.fork()
+        forked.update_inputs({election: value})
+        forked.resolve()
+        yield from _explore(forked, elections, {**choices, election: value}, total_tax_fields)
+
+
+def optimize(input_store, form_list, form_names, elections=ELECTIONS, total_tax_fields=TOTAL_TAX_FIELDS, solver_class=Solver):
+    """
+    Solve `form_names` for every relevant combination of the `elections`
+    inputs (overriding any values for them in `input_store`), and return the
+    resulting Outcomes, the solved ones first in order of increasing total
+    tax (the sum of those `total_tax_fields` which were solved). Elections
+    are only branched on when a field actually needs them, and the solver is
+    forked at each branch, so anything not depending on an election is only
+    solved once. `input_store` itself is left unchanged.
+    """
+    input_store = input_store.copy()
+    for election in elections:
+        if election in input_store:
+            del input_store[election]
+
+    solver = solver_class(input_store, form_list)
+    solver.solve(form_names)
+
+    outcomes = list(_explore(solver, elections, {}, total_tax_fields))
+    return sorted(outcomes, key=lambda o: (not o.solved, o.total_tax()))
@@ -1,5 +1,3 @@
-from types import MethodType
-
 class PDFValueTooLong(Exception):
     def __init__(self, pdf_field_name, field_name, max_length):
         self.message = f'Value from internal field {field_name} exceeded the max length of PDF field {pdf_field_name} (which is {max_length}) and could not be written'
@@ -17,21 +15,25 @@ class PDFInvalidChoiceValue(Exception):
         super().__init__(self.message)
 
 class PDFField(object):
+    # Forms have many PDF fields, so they don't have a __dict__
+    __slots__ = ('pdf_field_name', 'field_name', '_value_fn')
+
     def __init__(self, pdf_field_name, field_name, value_fn=None):
         self.pdf_field_name = pdf_field_name
         self.field_name = field_name
-        if value_fn is not None:
-            self._value_fn = MethodType(value_fn, self)
-        else:
-            self._value_fn = None
+        # Called with the PDF field as its first argument, as if it were a
+        # method
+        self._value_fn = value_fn
 
     def value(self, value, field_obj):
         if self._value_fn is not None:
-            return self._value_fn(value, field_obj)
+            return self._value_fn(self, value, field_obj)
         else:
             return field_obj.to_string(value)
 
 class TextPDFField(PDFField):
+    __slots__ = ('max_length',)
+
     def __init__(self, name, value, max_length=None, value_fn=None):
         self.max_length = max_length
         super().__init__(name, value, value_fn=value_fn)
@@ -43,19 +45,23 @@ class TextPDFField(PDFField):
         return value
 
 class ButtonPDFField(PDFField):
+    __slots__ = ('_true_value',)
+
     def __init__(self, name, value, true_value, value_fn=None):
         self._true_value = true_value # The value to return when this is true
         super().__init__(name, value, value_fn=value_fn)
 
     def value(self, value, field_obj):
         if self._value_fn is not None:
-            value = self._value_fn(value, field_obj)
+            value = self._value_fn(self, value, field_obj)
         if value:
             return self._true_value
         else:
             return 'Off'
 
 class OptionlessButtonPDFField(PDFField):
+    __slots__ = ()
+
     def __init__(self, name, value, value_fn=None):
         super().__init__(name, value, value_fn=value_fn)
 
@@ -64,6 +70,8 @@ class OptionlessButtonPDFField(PDFField):
         raise NotImplementedError()
 
 class ChoicePDFField(PDFField):
+    __slots__ = ('_choices',)
+
     def __init__(self, name, value, choices, value_fn=None):
         self._choices = choices
         super().__init__(name, value, value_fn=value_fn)
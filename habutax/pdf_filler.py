@@ -4,6 +4,7 @@ import subprocess
 
 from habutax import fields
 from habutax import inputs
+from habutax import tracing
 from habutax import values
 
 fdf_header = """%FDF-1.2
@@ -20,13 +21,16 @@ trailer
 """
 
 class PDFFiller(object):
-    def __init__(self, solution, available_forms, outfilename, flatten=True):
+    def __init__(self, solution, available_forms, outfilename, flatten=True, tracer=None):
         self._solution = solution
         self._form_map = {f.form_name: f for f in available_forms}
         self._output_filename = outfilename
         self._pdftk = 'pdftk'
         self._flatten = flatten
 
+        # A tracing.Tracer to record spans for each form and pdftk run with
+        self._tracer = tracer
+
         # Instances of Forms in the solution, and fields belonging to those
         # forms
         self.forms = []
@@ -57,14 +61,15 @@ class PDFFiller(object):
         if form_name not in self._form_map:
             raise NotImplementedError(f'Form {form_name} is not supported.')
 
-        form = self._form_map[form_name](instance=form_instance)
-        self.forms.append(form)
+        with tracing.span(self._tracer, full_form_name, 'form'):
+            form = self._form_map[form_name].create(instance=form_instance)
+            self.forms.append(form)
 
-        for f in form.fields():
-            assert f not in self._field_map
-            self._field_map[f.name()] = f
+            for f in form.fields():
+                assert f not in self._field_map
+                self._field_map[f.name()] = f
 
-        self._read_form_fields(full_form_name)
+            self._read_form_fields(full_form_name)
 
     def _create_fdf(self, data, filename):
         lines = []
@@ -103,7 +108,8 @@ class PDFFiller(object):
         cmd = [self._pdftk, form.pdf_file(), 'fill_form', fdf_filename, 'output', pdf_filename]
         if self._flatten:
             cmd.append('flatten')
-        res = subprocess.run(cmd, check=True)
+        with tracing.span(self._tracer, f'pdftk fill_form {form.name()}', 'pdftk'):
+            res = subprocess.run(cmd, check=True)
 
     def fill(self):
         for form_name in self._solution:
@@ -129,4 +135,5 @@ class PDFFiller(object):
             cmd = [self._pdftk]
             cmd.extend(pdfs)
             cmd.extend(['cat', 'output', self._output_filename])
-            res = subprocess.run(cmd, check=True)
+            with tracing.span(self._tracer, 'pdftk cat', 'pdftk', forms=len(pdfs)):
+                res = subprocess.run(cmd, check=True)
@@ -0,0 +1,202 @@
+from collections import Counter
+import marshal
+import time
+
+from habutax import fields
+from habutax import inputs
+from habutax import values
+
+# The exceptions counted for each field, and the column headings used for them
+COUNTED_EXCEPTIONS = [
+    (values.UnmetDependency, 'Unmet'),
+    (inputs.MissingInput, 'Missing'),
+    (inputs.MissingInputSpecification, 'NoSpec'),
+    (fields.FieldNotImplemented, 'Unimpl'),
+]
+
+
+def form_class_name(field_name):
+    """Return the name of the form (without any instance) `field_name` is on"""
+    return field_name.partition('.')[0].split(':')[0]
+
+
+class FieldProfile(object):
+    """
+    The work done on one field (or, summed, on all of one form's fields).
+    `attempts` counts the times the solver tried to solve it, including those
+    it skipped because a dependency it needed last time was still unsolved,
+    while `calls` counts the times its value function was actually run.
+    `total_time` is the wall time spent in those calls, and `self_time` the
+    part of it not spent evaluating other fields (which PullSolver does from
+    within a field's value function).
+    """
+    def __init__(self, name):
+        self.name = name
+        self.attempts = 0
+        self.calls = 0
+        self.total_time = 0.0
+        self.self_time = 0.0
+        self.exceptions = Counter()
+
+    def add(self, other):
+        self.attempts += other.attempts
+        self.calls += other.calls
+        self.total_time += other.total_time
+        self.self_time += other.self_time
+        self.exceptions.update(other.exceptions)
+
+
+def _code_location(field):
+    """Return the (filename, line number) of `field`'s value function, if it
+    can be found"""
+    fn = getattr(field, '_value_fn', None)
+    code = getattr(fn, '__code__', None)
+    if code is None:
+        return ('~', 0)
+    return (code.co_filename, code.co_firstlineno)
+
+
+class Profiler(object):
+    """
+    Profiles the fields evaluated by a Solver, when passed to its
+    set_profiler(). Every evaluation is timed, and nested evaluations (fields
+    pulled by PullSolver) are attributed to the field which pulled them as
+    well as to themselves, as in a call graph, so the results can also be
+    written out for tools which read pstats or collapsed stacks.
+    """
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._fields = {}
+        self._locations = {}
+
+        # The fields currently being evaluated, each with the time spent in
+        # the fields it has evaluated in turn, and its form
+        self._stack = []
+
+        # The time spent evaluating each form's fields, not counting the time
+        # of any field nested within another field of the same form twice
+        self._form_times = Counter()
+
+        # The self time spent under each stack of field names, and the number
+        # of calls and time spent in each (caller, callee) pair
+        self._stacks = Counter()
+        self._edges = {}
+
+    def _profile(self, field_name):
+        if field_name not in self._fields:
+            self._fields[field_name] = FieldProfile(field_name)
+        return self._fields[field_name]
+
+    def attempted(self, field_name):
+        self._profile(field_name).attempts += 1
+
+    def evaluate(self, field, form_inputs, form_values):
+        """Return `field`'s value, as Field.value() does, profiling the call"""
+        name = field.name()
+        if name not in self._locations:
+            self._locations[name] = _code_location(field)
+        frame = [name, 0.0, form_class_name(name)]
+        self._stack.append(frame)
+        start = self._clock()
+        try:
+            return field.value(form_inputs, form_values)
+        except BaseException as e:
+            for exception_type, heading in COUNTED_EXCEPTIONS:
+                if isinstance(e, exception_type):
+                    self._profile(name).exceptions[heading] += 1
+            raise
+        finally:
+            elapsed = self._clock() - start
+            self_time = elapsed - frame[1]
+            self._stacks[tuple(f[0] for f in self._stack)] += self_time
+            self._stack.pop()
+
+            profile = self._profile(name)
+            profile.calls += 1
+            profile.total_time += elapsed
+            profile.self_time += self_time
+
+            caller = self._stack[-1][0] if len(self._stack) > 0 else None
+            if caller is not None:
+                self._stack[-1][1] += elapsed
+            if not any(f[2] == frame[2] for f in self._stack):
+                self._form_times[frame[2]] += elapsed
+            edge = self._edges.setdefault((caller, name), [0, 0.0, 0.0])
+            edge[0] += 1
+            edge[1] += self_time
+            edge[2] += elapsed
+
+    def fields(self):
+        """Return a FieldProfile for each field, the most time-consuming (by
+        self time) first"""
+        return sorted(self._fields.values(), key=lambda p: (-p.self_time, p.name))
+
+    def forms(self):
+        """Return a FieldProfile summing the fields of each form (adding up all
+        instances of forms like W-2), the most time-consuming first. Its
+        `total_time` is the time spent in the form's fields, including the
+        other fields they evaluated."""
+        forms = {}
+        for profile in self._fields.values():
+            form_name = form_class_name(profile.name)
+            if form_name not in forms:
+                forms[form_name] = FieldProfile(form_name)
+            forms[form_name].add(profile)
+        for form_name, form_profile in forms.items():
+            form_profile.total_time = self._form_times[form_name]
+        return sorted(forms.values(), key=lambda p: (-p.self_time, p.name))
+
+    def report(self, top=20, file=None):
+        """Print tables of the `top` most time-consuming fields and forms"""
+        profiles = self.fields()
+        total = FieldProfile('total')
+        for profile in profiles:
+            total.add(profile)
+        print(f'\nEvaluated {len(profiles)} fields in {total.calls} calls taking {total.self_time * 1000:.2f}ms', file=file)
+        self._print_table('Field', profiles[:top], file)
+        self._print_table('Form', self.forms()[:top], file)
+
+    def _print_table(self, heading, profiles, file):
+        headings = [heading, 'Self ms', 'Total ms', 'Calls', 'Attempts'] + [h for _, h in COUNTED_EXCEPTIONS]
+        rows = []
+        for p in profiles:
+            rows.append([p.name, f'{p.self_time * 1000:.3f}', f'{p.total_time * 1000:.3f}', str(p.calls), str(p.attempts)] +
+                        [str(p.exceptions[h]) for _, h in COUNTED_EXCEPTIONS])
+        widths = [max(len(row[n]) for row in [headings] + rows) for n in range(len(headings))]
+
+        print(file=file)
+        for row in [headings] + rows:
+            cells = [row[0].ljust(widths[0])] + [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+            print('  '.join(cells), file=file)
+
+    def _pstats_key(self, field_name):
+        filename, line = self._locations.get(field_name, ('~', 0))
+        return (filename, line, field_name)
+
+    def pstats(self):
+        """Return the profile as the dict marshalled into pstats files, with
+        each field as a function (named after the field, at the location of
+        its value function)"""
+        stats = {}
+        for profile in self._fields.values():
+            if profile.calls > 0:
+                stats[self._pstats_key(profile.name)] = (profile.calls, profile.calls, profile.self_time, profile.total_time, {})
+        for (caller, callee), (calls, self_time, total_time) in self._edges.items():
+            if caller is not None:
+                stats[self._pstats_key(callee)][4][self._pstats_key(caller)] = (calls, calls, self_time, total_time)
+        return stats
+
+    def write_pstats(self, filename):
+        """Write the profile to `filename` in the format read by
+        pstats.Stats (and so by tools such as snakeviz and gprof2dot)"""
+        with open(filename, 'wb') as outfile:
+            marshal.dump(self.pstats(), outfile)
+
+    def write_collapsed(self, filename):
+        """Write the self time spent under each stack of fields to `filename`
+        as collapsed stacks (one 'solve;field;pulled_field microseconds' line
+        per stack), as read by flamegraph.pl, speedscope, etc."""
+        with open(filename, 'w') as outfile:
+            for stack, self_time in sorted(self._stacks.items()):
+                frames = ';'.join(('solve',) + stack)
+                outfile.write(f'{frames} {round(self_time * 1000000)}\n')
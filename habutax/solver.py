@@ -1,21 +1,72 @@
+import asyncio
+from collections import Counter, deque
+import configparser
+import contextlib
+import copy
+import functools
+import hashlib
+import heapq
+import json
+import os
+import time
+
 from habutax import fields
 from habutax import form
 from habutax import inputs
 from habutax import values
 
+# The version of the dict returned by Solver.to_state()
+STATE_FORMAT = 1
+
+# The default number of times a field may be re-attempted in a row without any
+# dependency being met in between before solve() gives up on it (see Livelock)
+MAX_RETRIES = 100
+
+class SolveLimitExceeded(Exception):
+    def __init__(self, limit, message_fmt="Exceeded solve limit: {limit}"):
+        self.limit = limit
+        self.message = message_fmt.format(limit=limit)
+        super().__init__(self.message)
+
+class Livelock(Exception):
+    def __init__(self, field_name, attempts, message_fmt="{field_name} was attempted {attempts} times without any new dependencies being met"):
+        self.field_name = field_name
+        self.attempts = attempts
+        self.message = message_fmt.format(field_name=field_name, attempts=attempts)
+        super().__init__(self.message)
+
+class _StopSolving(BaseException):
+    """Raised to stop solving early, carrying the exception explaining why
+    (see Solver.blocked_by()). This is a BaseException so that it isn't
+    swallowed by any `except Exception` in a field's value function."""
+    def __init__(self, cause):
+        self.cause = cause
+        super().__init__(cause.message)
+
 class DependencyTracker(object):
     def __init__(self):
         # map names of unmet dependencies to a list of their outstanding
         # dependents
         self._unmet = {}
 
-        # A list of the names of newly-satisfied dependencies
-        self._met = []
+        # A queue of the names of newly-satisfied dependencies, along with how
+        # many times each name is present in it
+        self._met = deque()
+        self._met_counts = {}
+
+        # The total number of times meet() has been called
+        self._meets = 0
+
+        # The number of dependencies in self._unmet which are not also waiting
+        # in self._met
+        self._outstanding = 0
 
     def add_unmet(self, dependency_name, dependent):
         """Add an unmet dependency for a particular dependent"""
         if dependency_name not in self._unmet:
             self._unmet[dependency_name] = [dependent]
+            if dependency_name not in self._met_counts:
+                self._outstanding += 1
         else:
             self._unmet[dependency_name].append(dependent)
 
@@ -28,20 +79,41 @@ class DependencyTracker(object):
         """Returns True if there are still unmet dependencies (does not count
         met dependencies which have not yet been removed via a call to
         met_dependents()"""
-        for dependency, dependents in self._unmet.items():
-            if len(dependents) > 0 and dependency not in self._met:
-                return True
-        return False
+        return self._outstanding > 0
+
+    def is_unmet(self, dependency_name):
+        """Returns True if any dependents are waiting on `dependency_name`"""
+        return dependency_name in self._unmet
 
     def meet(self, dependency_name):
         """Mark a depdendency as having been satisfied (allows any dependents
         to be released in met_dependents()"""
+        if dependency_name in self._unmet and dependency_name not in self._met_counts:
+            self._outstanding -= 1
         self._met.append(dependency_name)
+        self._met_counts[dependency_name] = self._met_counts.get(dependency_name, 0) + 1
+        self._meets += 1
+
+    def meets(self):
+        """Return the number of dependencies met so far"""
+        return self._meets
+
+    def _pop_met(self):
+        met = self._met.popleft()
+        if self._met_counts[met] == 1:
+            del self._met_counts[met]
+        else:
+            self._met_counts[met] -= 1
 
     def unmet_dependencies(self):
         """Returns the names of the unmet dependencies"""
         return list(self._unmet.keys())
 
+    def met_dependencies(self):
+        """Returns the names of the dependencies which have been met but not
+        yet removed by met_dependents(), in the order they were met"""
+        return list(self._met)
+
     def unmet_dependents(self, dependency):
         """Return the list of objects of the dependents waiting on an unmet dependency"""
         return self._unmet[dependency]
@@ -59,13 +131,47 @@ class DependencyTracker(object):
 
                 if len(self._unmet[met]) == 0:
                     del self._unmet[met]
-                    self._met.pop(0)
+                    self._pop_met()
 
                 yield dependent
             else:
-                self._met.pop(0)
+                self._pop_met()
                 continue
 
+    def copy(self, dependent_map=None):
+        """Return an independent copy of this tracker. If `dependent_map` is
+        supplied, each dependent is replaced by the object it maps the
+        dependent's name to."""
+        other = DependencyTracker()
+        if dependent_map is None:
+            other._unmet = {dependency: list(dependents) for dependency, dependents in self._unmet.items()}
+        else:
+            other._unmet = {dependency: [dependent_map[d.name()] for d in dependents]
+                            for dependency, dependents in self._unmet.items()}
+        other._met = deque(self._met)
+        other._met_counts = dict(self._met_counts)
+        other._outstanding = self._outstanding
+        other._meets = self._meets
+        return other
+
+    def discard_dependents(self, dependent_names):
+        """Stop tracking any dependents whose names are in `dependent_names`,
+        forgetting any dependencies left without dependents. Returns the
+        dependents which were discarded."""
+        discarded = {}
+        for dependency in list(self._unmet.keys()):
+            for d in self._unmet[dependency]:
+                if d.name() in dependent_names:
+                    discarded[d.name()] = d
+            dependents = [d for d in self._unmet[dependency] if d.name() not in dependent_names]
+            if len(dependents) > 0:
+                self._unmet[dependency] = dependents
+            else:
+                del self._unmet[dependency]
+                if dependency not in self._met_counts:
+                    self._outstanding -= 1
+        return list(discarded.values())
+
 def _sort_keys(key):
     last_numeric = False
     last_alpha = False
@@ -99,22 +205,228 @@ def _sort_keys(key):
         else:
             keys.append((True, current))
 
-    return keys
+    return tuple(keys)
+
+@functools.lru_cache(maxsize=None)
+def _name_sort_keys(name):
+    if '.' in name:
+        form, key = name.split('.')
+    else:
+        form, key = '', name
+    return (_sort_keys(form), _sort_keys(key))
 
 def sort_keys(key):
+    """Return a key for sorting field/input names (or Field/Input objects) so
+    that numbered lines sort naturally (i.e. 1040.1a < 1040.2 < 1040.10). Keys
+    are only computed once per name."""
     if isinstance(key, fields.Field) or isinstance(key, inputs.Input):
         key = key.name()
+    return _name_sort_keys(key)
+
+def _subclasses(cls):
+    """Return all (recursive) subclasses of `cls`"""
+    subclasses = []
+    for subclass in cls.__subclasses__():
+        subclasses.append(subclass)
+        subclasses.extend(_subclasses(subclass))
+    return subclasses
+
+def _readers(input_names, input_readers, value_readers):
+    """Return the names of the fields which read any of `input_names`, given
+    dicts mapping each input and field name to the names of the fields which
+    read it, whether directly or via the values of other fields"""
+    found = set()
+    stack = [f for input_name in input_names for f in input_readers.get(input_name, [])]
+    while len(stack) > 0:
+        field_name = stack.pop()
+        if field_name in found:
+            continue
+        found.add(field_name)
+        stack.extend(value_readers.get(field_name, []))
+    return found
+
+class _Descending(object):
+    """Wraps a sort key so that it orders in reverse"""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+class WorkQueue(object):
+    """
+    Priority queue of the fields waiting to be attempted. Fields are popped in
+    descending sort_keys() order and, among fields with equal keys, most
+    recently pushed first (the same order as repeatedly sorting a list and
+    popping its last element, but O(log n) per field).
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._pushed = 0
+
+    def push(self, field):
+        self._pushed += 1
+        heapq.heappush(self._heap, (_Descending(sort_keys(field)), -self._pushed, field))
+
+    def extend(self, fields):
+        for field in fields:
+            self.push(field)
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    def fields(self):
+        """Return the queued fields in the order they would be popped"""
+        return [field for _, _, field in sorted(self._heap)]
+
+    def copy(self, field_map=None):
+        """Return an independent copy of this queue. If `field_map` is
+        supplied, each field is replaced by the field it maps its name to."""
+        other = WorkQueue()
+        if field_map is None:
+            other._heap = list(self._heap)
+        else:
+            # Replacing the fields doesn't change their keys, so the heap
+            # stays ordered. Fields missing from `field_map` (such as those
+            # PullSolver already pulled, whose forms have since been
+            # discarded) are kept as they are.
+            other._heap = [(key, pushed, field_map.get(field.name(), field)) for key, pushed, field in self._heap]
+        other._pushed = self._pushed
+        return other
+
+    def __len__(self):
+        return len(self._heap)
+
+def load_dependency_cache(filename):
+    """Read a dependency cache written by Solver.save_dependency_cache(),
+    returning None if it doesn't exist or can't be read"""
+    try:
+        with open(filename) as infile:
+            return json.load(infile)
+    except (OSError, ValueError):
+        return None
+
+class PlanCache(object):
+    """
+    A directory of dependency caches (see Solver.dependency_cache()), used as
+    compiled solve plans. Plans are grouped into one file per key (tax years,
+    HabuTax version, and requested forms/fields), each holding one plan per
+    shape of inputs encountered.
+    """
+    def __init__(self, directory):
+        self._directory = directory
+
+    def _filename(self, key):
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, f'{digest[:16]}.json')
+
+    def plans(self, key):
+        """Return all cached plans for `key`"""
+        plans = load_dependency_cache(self._filename(key))
+        if not isinstance(plans, list):
+            return []
+        return [p for p in plans if p.get('key') == key]
+
+    def add(self, plan):
+        """Add `plan`, replacing any existing plan for the same shape"""
+        plans = [p for p in self.plans(plan['key']) if p['shape'] != plan['shape']]
+        plans.append(plan)
+        os.makedirs(self._directory, exist_ok=True)
+        filename = self._filename(plan['key'])
+        with open(filename + '.tmp', 'w') as outfile:
+            json.dump(plans, outfile)
+        os.replace(filename + '.tmp', filename)
+
+    def solve(self, solver, form_names, field_names=[], **kwargs):
+        """Solve using `solver`, following any cached plan which matches the
+        shape of its inputs. If none does, and the solve is successful, its
+        plan is added to the cache. Any other keyword arguments are passed to
+        solver.solve(), whose result is returned."""
+        key = solver.dependency_cache_key(form_names, field_names)
+        solved = solver.solve(form_names, field_names, warm_start=self.plans(key), **kwargs)
+        if solved and not solver.warm_started():
+            self.add(solver.dependency_cache())
+        return solved
+
+def _traced(category, describe):
+    """Decorate a Solver method to record a span named `describe(*args)`
+    for each call while the solver has a tracer (see Solver.set_tracer())"""
+    def decorator(method):
+        @functools.wraps(method)
+        def traced(self, *args, **kwargs):
+            if self._tracer is None:
+                return method(self, *args, **kwargs)
+            with self._tracer.span(describe(*args), category):
+                return method(self, *args, **kwargs)
+        return traced
+    return decorator
+
+
+class SolverObserver(object):
+    """
+    Receives events from a Solver it is added to (see Solver.add_observer()).
+    Subclasses override whichever of these methods they are interested in.
+    Events are delivered synchronously, as they happen, so observers should
+    return quickly and must not modify the solver.
+    """
+    def form_added(self, form_name):
+        """The form named `form_name` (including any instance, i.e.
+        'w-2:0') was added, so its fields may now be solved"""
+        pass
+
+    def field_solved(self, field_name, value):
+        """The field named `field_name` was solved, with the value `value`"""
+        pass
+
+    def field_blocked(self, field_name, dependency):
+        """The field named `field_name` is waiting for `dependency`, the name
+        of an unsolved field or missing input"""
+        pass
+
+    def field_unimplemented(self, field_name, message):
+        """The field named `field_name` raised FieldNotImplemented"""
+        pass
+
+    def input_requested(self, input_name, needed_by):
+        """The prompt is being asked for the input named `input_name`, which
+        is needed by the fields named in `needed_by`"""
+        pass
 
-    if '.' in key:
-        form, key = key.split('.')
-    else:
-        form = ''
-    return (_sort_keys(form), _sort_keys(key))
 
 class Solver(object):
-    def __init__(self, input_config, form_list, prompt=None):
+    def __init__(self, input_config, form_list, prompt=None, record_dependencies=False, collect_dependencies=False, batch_prompt=None):
+        """
+        Create a solver for the forms in `form_list`, reading inputs from the
+        InputStore `input_config`. If supplied, `prompt` is called to ask for
+        any missing inputs. Alternatively, `batch_prompt` is called with a
+        list of (Input, needed_by) tuples to ask for all of the currently
+        missing inputs at once, and returns a dict mapping the names of those
+        it could supply to their (string) values (see _prompt_batch()). If
+        `record_dependencies` is True, the solver
+        additionally remembers every key each field has read and found missing,
+        and uses them to avoid re-attempting a field before all of its known
+        dependencies are met. This only saves attempts when re-solving (after
+        update_inputs()), since within one solve a field has always already
+        read the values it read before it was parked; to avoid retrying a
+        field once per missing dependency in the first solve (e.g. once per
+        W-2), use `collect_dependencies`. If `collect_dependencies` is True,
+        fields keep being evaluated past missing inputs/values (see
+        values.DependencyCollector) so that all of them can be waited on (and
+        their forms added) at once.
+        """
         self._prompt = prompt
-        self._refused_input = self._prompt is None
+        self._batch_prompt = batch_prompt
+        self._refused_input = self._prompt is None and self._batch_prompt is None
+
+        # Inputs the batch prompt declined to supply (which are not asked for
+        # again until resolve())
+        self._declined_inputs = set()
 
         # Create a map to easily look up the available forms by name
         self._form_map = {f.form_name: f for f in form_list}
@@ -130,24 +442,113 @@ class Solver(object):
         # Current state of solver, including form instances, values calculated,
         # any unmet field/input dependencies
         self.forms = {}
+        self._input_only_forms = {}
         self._v = values.ValueStore()
-        self._unattempted_fields = []
+        self._unattempted_fields = WorkQueue()
         self._unimplemented_fields = []
         self._solving_fields = set()
         self._field_dependencies = DependencyTracker()
         self._input_dependencies = DependencyTracker()
 
+        # The forms and fields solve() was asked for, and a map of each
+        # attempted field's name to the names of the inputs and values it read
+        # the last time it was attempted (used to re-solve incrementally)
+        self._form_names = []
+        self._field_names = []
+        self._reads = {}
+
+        # State for `record_dependencies` mode: the keys each field found
+        # missing, the number of dependencies each field parked on several
+        # dependencies is still waiting for, and those fields parked only
+        # because of a dependency they read in a previous attempt
+        self._record_dependencies = record_dependencies
+        self._collect_dependencies = collect_dependencies
+        self._missing = {}
+        self._waiting = {}
+        self._speculative = set()
+
+        # Set by query(), in which case only the fields which the requested
+        # fields depend on are solved, not every required field of their forms
+        self._query_only = False
+
+        # Set if solve() was able to use a `warm_start` dependency cache
+        self._warm_started = False
+
+        # Set by solve() in `fail_fast` mode, along with the exception which
+        # caused solving to stop early (if it did)
+        self._fail_fast = False
+        self._blocked_by = None
+
+        # Limits set by solve(): its time and attempt budgets, the time and
+        # attempt count at which they run out (restarted by resolve() and
+        # query()), and its progress callback. `_limited` is set if any of
+        # these need checking before each attempt.
+        self._time_budget = None
+        self._max_attempts = None
+        self._deadline = None
+        self._attempt_limit = None
+        self._progress = None
+        self._limited = False
+        self._run_started = None
+
+        # For detecting livelock, the number of dependencies which had been
+        # met at each field's last attempt, and how many times in a row it has
+        # been attempted without any more being met
+        self._max_retries = MAX_RETRIES
+        self._retries = {}
+
+        # Counts of solver events (see stats())
+        self._stats = Counter()
+
+        # SolverObservers to notify of solver events (checked before building
+        # each event, so that they cost next to nothing when there are none)
+        self._observers = []
+
+        # A profiling.Profiler through which fields are evaluated, and a
+        # tracing.Tracer recording spans for the solver's work, if any
+        self._profiler = None
+        self._tracer = None
+
         self._done_solving = False # Set to True if/when done solving
         self._solved = False       # Set to True if/when successfully solved
 
+    def add_observer(self, observer):
+        """Notify the SolverObserver `observer` of events while solving"""
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        self._observers.remove(observer)
+
+    def set_profiler(self, profiler):
+        """Record the time spent on, and the outcome of, each field attempt
+        with the profiling.Profiler `profiler` (or stop, if it is None)"""
+        self._profiler = profiler
+
+    def set_tracer(self, tracer):
+        """Record spans for the forms added, fields attempted, and prompts
+        made with the tracing.Tracer `tracer` (or stop, if it is None). Use
+        Tracer.attach() to also record the outcome of each attempt."""
+        self._tracer = tracer
+
+    def _evaluate(self, field, form_inputs, form_values):
+        if self._profiler is not None:
+            return self._profiler.evaluate(field, form_inputs, form_values)
+        return field.value(form_inputs, form_values)
+
+    def _notify_input_requested(self, input_name, needed_by):
+        for observer in self._observers:
+            observer.input_requested(input_name, [f.name() for f in needed_by])
+
     def _add_unattempted(self, unattempted):
         if isinstance(unattempted, list):
             self._unattempted_fields.extend(unattempted)
         else:
-            self._unattempted_fields.append(unattempted)
-        self._unattempted_fields.sort(key=sort_keys)
+            self._unattempted_fields.push(unattempted)
+        if len(self._unattempted_fields) > self._stats['peak_queue']:
+            self._stats['peak_queue'] = len(self._unattempted_fields)
 
-    def _add_form(self, form_name, input_only=False):
+    @_traced('form', lambda form_name, *args, **kwargs: form_name)
+    def _add_form(self, form_name, input_only=False, schedule_required=True):
         """
         Add a form to those that the solver is aware of. This typically makes
         its fields and inputs available to to be used by other forms, and
@@ -156,26 +557,40 @@ class Solver(object):
         any of its fields to be attempted (unless later used by other forms,
         meaning _add_form() will be called again. This `input_only` mode only
         causes inputs to be added, and is intended to allow for de-duplicating
-        input felds when multiple forms need the same input.
+        input felds when multiple forms need the same input. If
+        `schedule_required` is False, the form's fields are added but its
+        required fields are left for the caller to schedule.
         """
         form_name, form_instance = form.name_and_instance(form_name)
 
         if form_name not in self._form_map:
             raise NotImplementedError(f'Form {form_name} is not supported.')
 
-        new_form = self._form_map[form_name](solver=self, instance=form_instance)
+        full_name = form_name if form_instance is None else f'{form_name}:{form_instance}'
+        if full_name in self._input_only_forms:
+            # Its inputs were already added, so re-use this instance rather than
+            # creating the form again
+            new_form = self._input_only_forms[full_name]
+            if input_only:
+                return
+            del self._input_only_forms[full_name]
+        else:
+            new_form = self._form_map[form_name].create(solver=self, instance=form_instance)
+            self._stats['forms'] += 1
 
-        # Add new inputs to our internal map of names to input objects, update
-        # the input mapper so it understands how to read these inputs
-        for i in new_form.inputs():
-            assert i not in self._input_map
-            self._input_map[i.name()] = i
-        self._i.update_input_spec(self._input_map)
+            # Add new inputs to our internal map of names to input objects,
+            # update the input mapper so it understands how to read these
+            # inputs
+            for i in new_form.inputs():
+                assert i not in self._input_map
+                self._input_map[i.name()] = i
+            self._i.update_input_spec(self._input_map)
 
         # Don't add the form to our map of forms, any fields to our field map,
         # or any fields to the lists of unattempted fields, or fields we are
         # solving
         if input_only:
+            self._input_only_forms[new_form.name()] = new_form
             return
 
         self.forms[new_form.name()] = new_form
@@ -184,18 +599,33 @@ class Solver(object):
             assert f not in self._field_map
             self._field_map[f.name()] = f
 
-        self._add_unattempted(new_form.required_fields())
-        self._solving_fields |= set([f.name() for f in new_form.required_fields()])
+        if self._observers:
+            for observer in self._observers:
+                observer.form_added(new_form.name())
+
+        if schedule_required:
+            self._schedule_required(new_form)
+
+    def _schedule_required(self, scheduled_form):
+        """Schedule any required fields of `scheduled_form` which the solver is
+        not already solving to be attempted"""
+        required = [f for f in scheduled_form.required_fields() if f.name() not in self._solving_fields]
+        self._add_unattempted(required)
+        self._solving_fields |= set([f.name() for f in required])
 
     def _add_input_spec(self, input_name):
         form_name, _ = input_name.split('.')
         self._add_form(form_name, input_only=True)
 
+    @_traced('prompt', lambda input_name, needed_by: input_name)
     def _attempt_input(self, input_name, needed_by):
         assert input_name in self._input_map
         missing = self._input_map[input_name]
 
+        if self._observers:
+            self._notify_input_requested(input_name, needed_by)
         value, supplied = self._prompt(missing, needed_by)
+        self._stats['prompts'] += 1
 
         if supplied:
             assert missing.valid(value)
@@ -203,39 +633,339 @@ class Solver(object):
             self._input_dependencies.meet(missing.name())
         else:
             self._refused_input = True
+            if self._fail_fast:
+                raise _StopSolving(inputs.MissingInput(input_name))
         return supplied
 
+    @_traced('prompt', lambda input_names: f'{len(input_names)} inputs')
+    def _prompt_batch(self, input_names):
+        """
+        Ask `batch_prompt` for all of the inputs named in `input_names` at
+        once. Any it does not return a value for are not asked for again, and
+        if it doesn't return any values at all (or there is nothing left to
+        ask for), the solver stops asking for inputs.
+        """
+        asking = [n for n in input_names if n not in self._declined_inputs]
+        if len(asking) == 0:
+            if len(input_names) > 0:
+                self._refused_input = True
+            return
+        input_names = asking
+
+        missing = [(self._input_map[n], list(self._input_dependencies.unmet_dependents(n))) for n in input_names]
+        if self._observers:
+            for missing_input, needed_by in missing:
+                self._notify_input_requested(missing_input.name(), needed_by)
+        answers = self._batch_prompt(missing)
+        self._stats['prompts'] += 1
+
+        for input_name in input_names:
+            if input_name not in answers:
+                if self._fail_fast:
+                    raise _StopSolving(inputs.MissingInput(input_name))
+                self._declined_inputs.add(input_name)
+                continue
+            value = answers[input_name]
+            if not self._input_map[input_name].valid(value):
+                raise inputs.InvalidInput(input_name, value)
+            self._i[input_name] = value
+            self._input_dependencies.meet(input_name)
+        if len(answers) == 0:
+            self._refused_input = True
+
+    def _need_field(self, field_name):
+        """Ensure the field named `field_name` is (or will be) attempted,
+        adding its form if the solver hasn't seen it yet"""
+        if field_name not in self._solving_fields:
+            # If this field is not even in the list of forms the solver is
+            # aware of, it must be in another form - find that form
+            if field_name not in self._field_map:
+                form_name, _ = field_name.split('.')
+                self._add_form(form_name, schedule_required=not self._query_only)
+            assert field_name in self._field_map
+            # Adding the form may already have scheduled this (required) field
+            if field_name not in self._solving_fields:
+                self._add_unattempted(self._field_map[field_name])
+                self._solving_fields.add(field_name)
+
+    def _park(self, field, field_dependencies=[], input_dependencies=[]):
+        """Wait to re-attempt `field` until all of the given field and input
+        dependencies are met"""
+        if self._fail_fast and self._refused_input and len(input_dependencies) > 0:
+            # Nothing will supply the input, so nothing can be solved
+            for dependency in input_dependencies:
+                self._input_dependencies.add_unmet(dependency, field)
+            raise _StopSolving(inputs.MissingInput(input_dependencies[0]))
+        if self._observers:
+            for dependency in field_dependencies + input_dependencies:
+                for observer in self._observers:
+                    observer.field_blocked(field.name(), dependency)
+        for dependency in field_dependencies:
+            self._need_field(dependency)
+            self._field_dependencies.add_unmet(dependency, field)
+        for dependency in input_dependencies:
+            self._input_dependencies.add_unmet(dependency, field)
+
+        waiting = len(field_dependencies) + len(input_dependencies)
+        if waiting > 1:
+            self._waiting[field.name()] = waiting
+
+    def _released(self, field):
+        """Called each time a dependency `field` is parked on is met. Returns
+        True once `field` is no longer waiting on any dependencies."""
+        name = field.name()
+        if name not in self._waiting:
+            return True
+        self._waiting[name] -= 1
+        if self._waiting[name] > 0:
+            return False
+        del self._waiting[name]
+        return True
+
+    def _park_on_known_dependencies(self, field):
+        """
+        In `record_dependencies` mode, check the values `field` read the last
+        time it was attempted before attempting it again. If any of them are
+        scheduled to be solved but have not yet been, wait for all of them
+        instead of attempting the field (and hitting the first of them as an
+        UnmetDependency). Returns True if the field was parked.
+        """
+        name = field.name()
+        if name in self._speculative:
+            self._speculative.remove(name)
+            return False
+        if name not in self._reads:
+            return False
+
+        unsolved = [k for k in self._reads[name][1] if k in self._solving_fields and k not in self._v]
+        if len(unsolved) == 0:
+            return False
+
+        self._park(field, field_dependencies=sorted(unsolved, key=sort_keys))
+        self._speculative.add(name)
+        self._stats['attempts_saved'] += 1
+        self._stats['exceptions_saved'] += len(unsolved)
+        return True
+
+    def _release_speculative(self):
+        """Attempt any fields still parked on dependencies only read in a
+        previous attempt, in case their current attempt no longer needs them.
+        Returns True if any such fields were found."""
+        parked = [self._field_map[name] for name in self._speculative]
+        if len(parked) == 0:
+            return False
+
+        names = set(self._speculative)
+        self._field_dependencies.discard_dependents(names)
+        for name in names:
+            self._waiting.pop(name, None)
+        self._attempt_all(sorted(parked, key=sort_keys))
+        return True
+
+    def _park_on_collected(self, field, collector):
+        """Wait for all the missing dependencies found in one attempt of
+        `field` in `collect_dependencies` mode"""
+        self._stats['exceptions'] += 1
+        found = len(collector.values) + len(collector.inputs)
+        if len(collector.values) > 0:
+            self._stats['wasted_attempts'] += 1
+        self._stats['attempts_saved'] += found - 1
+        self._stats['exceptions_saved'] += found - 1
+        for key in collector.values + collector.inputs:
+            self._record_missing(field, key)
+        # Keys found missing but not collected were only read with
+        # placeholders standing in for earlier ones, so may never be read by
+        # a real evaluation (and mustn't keep the fields they name reachable)
+        input_reads, value_reads = self._reads[field.name()]
+        input_reads.difference_update([k for k in input_reads if k not in self._i and k not in collector.inputs])
+        value_reads.difference_update([k for k in value_reads if k not in self._v and k not in collector.values])
+        self._park(field, field_dependencies=collector.values, input_dependencies=collector.inputs)
+
+    def _record_missing(self, field, key):
+        if self._record_dependencies:
+            self._missing.setdefault(field.name(), set()).add(key)
+
+    def _check_retries(self, field):
+        """Stop solving if `field` has been attempted too many times in a row
+        without any dependencies being met (which would otherwise go on
+        forever, e.g. if a form keeps raising the same exception)"""
+        name = field.name()
+        meets = self._field_dependencies.meets() + self._input_dependencies.meets()
+        previous = self._retries.get(name)
+        retries = previous[1] + 1 if previous is not None and previous[0] == meets else 0
+        if retries > self._max_retries:
+            raise _StopSolving(Livelock(name, retries))
+        self._retries[name] = (meets, retries)
+
+    def _check_limits(self, field):
+        """Report progress, and stop solving (leaving `field` to be attempted
+        by a later resolve()) if the time or attempt budget has run out"""
+        if self._progress is not None:
+            self._report_progress()
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            exceeded = SolveLimitExceeded(f'time budget of {self._time_budget}s')
+        elif self._attempt_limit is not None and self._stats['attempts'] >= self._attempt_limit:
+            exceeded = SolveLimitExceeded(f'budget of {self._max_attempts} field attempts')
+        else:
+            return
+        self._add_unattempted(field)
+        raise _StopSolving(exceeded)
+
+    def _start_run(self):
+        """Start timing a call to solve(), resolve(), or query(), and start
+        the time and attempt budgets set by solve() afresh"""
+        self._run_started = time.perf_counter()
+        self._deadline = None if self._time_budget is None else time.monotonic() + self._time_budget
+        self._attempt_limit = None if self._max_attempts is None else self._stats['attempts'] + self._max_attempts
+        self._limited = self._time_budget is not None or self._max_attempts is not None or self._progress is not None
+        self._retries = {}
+
+    def _report_progress(self):
+        solved = len(self._v)
+        self._progress(solved, len(self._solving_fields) - solved)
+
+    @contextlib.contextmanager
+    def _stoppable(self):
+        """Record why solving stopped if it is stopped early"""
+        try:
+            yield
+        except _StopSolving as stop:
+            self._blocked_by = stop.cause
+
+    @_traced('field', lambda field: field.name())
     def _attempt_field(self, field):
+        if self._profiler is not None:
+            self._profiler.attempted(field.name())
+        if self._record_dependencies and self._park_on_known_dependencies(field):
+            return
+
+        if self._limited:
+            self._check_limits(field)
+        self._check_retries(field)
+
+        input_reads = set()
+        value_reads = set()
+        self._reads[field.name()] = (input_reads, value_reads)
+        self._stats['attempts'] += 1
+        if self._collect_dependencies:
+            collector = values.DependencyCollector()
+            form_inputs = form.CollectingAccessor(self._i, field.form(), collector, reads=input_reads)
+            form_values = form.CollectingAccessor(self._v, field.form(), collector, reads=value_reads)
+        else:
+            collector = None
+            form_inputs = form.FormAccessor(self._i, field.form(), reads=input_reads)
+            form_values = self._values_accessor(field, value_reads)
+
         try:
-            form_inputs = form.FormAccessor(self._i, field.form())
-            form_values = form.FormAccessor(self._v, field.form())
-            self._v[field.name()] = field.value(form_inputs, form_values)
+            try:
+                value = self._evaluate(field, form_inputs, form_values)
+            except _StopSolving:
+                # Stopped while evaluating a field this one pulled (see
+                # PullSolver), so this one still needs attempting too
+                self._add_unattempted(field)
+                raise
+            except Exception:
+                # Evaluating with placeholders may raise just about anything,
+                # which only matters if there were no placeholders
+                if collector is None or not collector.found_missing():
+                    raise
+            if collector is not None and collector.found_missing():
+                self._park_on_collected(field, collector)
+                return
+            self._v[field.name()] = value
             self._field_dependencies.meet(field.name())
+            if self._observers:
+                for observer in self._observers:
+                    observer.field_solved(field.name(), value)
         except values.UnmetDependency as ud:
-            # If this field is not already in the fields the solver is
-            # attempting to solve, add it
-            if ud.dependency not in self._solving_fields:
-                # If this field is not even in the list of forms the solver is
-                # aware of, it must be in another form - find that form
-                if ud.dependency not in self._field_map:
-                    form_name, field_name = ud.dependency.split('.')
-                    self._add_form(form_name)
-                assert ud.dependency in self._field_map
-                self._add_unattempted(self._field_map[ud.dependency])
-                self._solving_fields.add(ud.dependency)
-
-            self._field_dependencies.add_unmet(ud.dependency, field)
+            self._stats['exceptions'] += 1
+            self._stats['wasted_attempts'] += 1
+            self._record_missing(field, ud.dependency)
+            self._park(field, field_dependencies=[ud.dependency])
         except inputs.MissingInput as mi:
-            self._input_dependencies.add_unmet(mi.input_name, field)
+            self._stats['exceptions'] += 1
+            self._record_missing(field, mi.input_name)
+            self._park(field, input_dependencies=[mi.input_name])
         except inputs.MissingInputSpecification as mis:
+            self._stats['exceptions'] += 1
+            self._stats['input_spec_retries'] += 1
             self._add_input_spec(mis.input_name)
             return self._attempt_field(field)
         except fields.FieldNotImplemented as fni:
             self._unimplemented_fields.append(fni.field_name)
+            if self._observers:
+                for observer in self._observers:
+                    observer.field_unimplemented(fni.field_name, fni.message)
+            if self._fail_fast:
+                raise _StopSolving(fni)
+
+    def _attempt_all(self, fields):
+        """Attempt each of `fields` in turn. If solving is stopped part-way
+        through, those not yet attempted are queued to be attempted by a later
+        resolve() (they have already been released by their dependencies)."""
+        for n, field in enumerate(fields):
+            try:
+                self._attempt_field(field)
+            except _StopSolving:
+                self._add_unattempted(fields[n + 1:])
+                raise
+
+    def _values_accessor(self, field, value_reads):
+        return form.FormAccessor(self._v, field.form(), reads=value_reads)
+
+    def solve(self, form_names, field_names=[], warm_start=None, suspend=False, fail_fast=False,
+              time_budget=None, max_attempts=None, progress=None, max_retries=MAX_RETRIES):
+        """
+        Solve the forms named in `form_names` (and any specifically-requested
+        fields in `field_names`), returning True if they were completely
+        solved. `warm_start` may be a dependency cache from a previous solve
+        (see dependency_cache()), or a list of them. If one was produced for
+        the same forms and shape of inputs, its forms are added up front and
+        its fields solved in the order they were previously solved, which
+        avoids discovering dependencies one UnmetDependency at a time. If
+        `suspend` is True and solving stopped because inputs are missing, a
+        SolveSession is returned instead, which can be resumed once they are
+        supplied. If `fail_fast` is True, solving stops as soon as it can't
+        succeed, i.e. when a field turns out to be unimplemented or an input
+        is missing and won't be supplied (see blocked_by()).
+
+        Solving also stops early once it has taken more than `time_budget`
+        seconds or made `max_attempts` field attempts (budgets which
+        resolve() and query() start afresh, continuing where solving
+        stopped), or if any field is re-attempted more than `max_retries`
+        times in a row without any dependencies being met in between (a
+        livelock). If supplied, `progress` is called before each field
+        attempt, and when solving finishes, with the number of fields solved
+        and the number still outstanding.
+        """
+        self._fail_fast = fail_fast
+        self._time_budget = time_budget
+        self._max_attempts = max_attempts
+        self._progress = progress
+        self._max_retries = max_retries
+        self._start_run()
+        self._start_solving(form_names, field_names, warm_start)
+        self._solve_loop()
+        return self._stop_solving(suspend)
 
-    def solve(self, form_names, field_names=[]):
-        for form_name in form_names:
-            self._add_form(form_name)
+    def _start_solving(self, form_names, field_names, warm_start):
+        """Add the forms and fields requested by solve(), ready to solve
+        them"""
+        with self._stoppable():
+            self._add_requested(form_names, field_names, warm_start)
+
+    def _add_requested(self, form_names, field_names, warm_start):
+        self._form_names.extend(form_names)
+        self._field_names.extend(field_names)
+
+        if isinstance(warm_start, dict):
+            warm_start = [warm_start]
+        for cache in warm_start or []:
+            if self._warm_start(cache):
+                break
+        if not self._warm_started:
+            for form_name in form_names:
+                self._add_form(form_name)
 
         # Add any specifically-requested fields to the list of fields we need
         # to attempt. This is probably primarily useful for testing (where we
@@ -243,19 +973,452 @@ class Solver(object):
         # also including the forms which would typically include fields when
         # needed).
         for field_name in field_names:
-            self._add_unattempted(self._field_map[field_name])
+            if field_name not in self._solving_fields:
+                self._add_unattempted(self._field_map[field_name])
         self._solving_fields |= set(field_names)
 
+    def _stop_solving(self, suspend):
+        """Finish up after solve(), returning its result"""
+        if self._warm_started and self._blocked_by is None:
+            # The cached forms may include some this return doesn't need
+            self._discard_unreachable()
+        solved = self._finish_solving()
+        if suspend and self._blocked_by is None and self._input_dependencies.has_unmet():
+            return SolveSession(self)
+        return solved
+
+    def blocked_by(self):
+        """If solving stopped early, return the exception which stopped it:
+        a FieldNotImplemented or MissingInput in `fail_fast` mode, a
+        SolveLimitExceeded if its budget ran out, or a Livelock. Returns None
+        if it didn't stop early."""
+        assert self._done_solving
+        return self._blocked_by
+
+    def query(self, field_names):
+        """
+        Solve only the fields named in `field_names` and the fields they
+        depend on, skipping all other fields (even those required by their
+        forms). Returns a dict mapping the name of each requested field which
+        could be solved to its value. As with solve(), unimplemented_fields()
+        and unmet_input_dependencies() explain any which could not.
+        """
+        self._start_query(field_names)
+        self._solve_loop()
+        return self._stop_query(field_names)
+
+    def _start_query(self, field_names):
+        self._start_run()
+        self._query_only = True
+        self._field_names.extend(field_names)
+        for field_name in field_names:
+            self._need_field(field_name)
+
+    def _stop_query(self, field_names):
+        self._finish_solving()
+        return {name: self._v[name] for name in field_names if name in self._v}
+
+    def dependency_cache_key(self, form_names, field_names=[]):
+        """Return the key of the dependency caches which may be used to warm
+        start solving `form_names` (and `field_names`) using this solver"""
+        import habutax
+        return {
+            'tax_years': sorted(set([f.tax_year for f in self._form_map.values()])),
+            'version': habutax.__version__,
+            'forms': list(form_names),
+            'fields': list(field_names),
+        }
+
+    def fork(self):
+        """
+        Return a new solver which starts from the current state of this one
+        (i.e. after solve() or resolve()), but which may then diverge from it,
+        for example by calling update_inputs() and resolve() on each to explore
+        different elections. The fork gets its own copies of the forms, so
+        that its fields look up other forms (see Field.form()) in the fork,
+        but these share everything besides their inputs and fields (see
+        Form.create()). Solved values are shared between the two rather than
+        copied (values are only copied once either solver changes them).
+        """
+        forked = copy.copy(self)
+        forked.forms = {name: f.copy(forked) for name, f in self.forms.items()}
+        forked._input_only_forms = {name: f.copy(forked) for name, f in self._input_only_forms.items()}
+        all_forms = list(forked.forms.values()) + list(forked._input_only_forms.values())
+        input_map = {i.name(): i for f in all_forms for i in f.inputs()}
+        field_map = {fld.name(): fld for f in forked.forms.values() for fld in f.fields()}
+        forked._input_map = {name: input_map[name] for name in self._input_map}
+        forked._field_map = {name: field_map[name] for name in self._field_map}
+        forked._i = self._i.copy()
+        forked._i.update_input_spec(forked._input_map)
+        forked._v = self._v.copy()
+        forked._unattempted_fields = self._unattempted_fields.copy(field_map)
+        forked._unimplemented_fields = list(self._unimplemented_fields)
+        forked._solving_fields = set(self._solving_fields)
+        forked._declined_inputs = set(self._declined_inputs)
+        forked._field_dependencies = self._field_dependencies.copy(field_map)
+        forked._input_dependencies = self._input_dependencies.copy(field_map)
+        forked._form_names = list(self._form_names)
+        forked._field_names = list(self._field_names)
+        forked._reads = dict(self._reads)
+        forked._missing = {name: set(missing) for name, missing in self._missing.items()}
+        forked._waiting = dict(self._waiting)
+        forked._speculative = set(self._speculative)
+        forked._retries = dict(self._retries)
+        forked._observers = list(self._observers)
+        forked._stats = Counter(self._stats)
+        return forked
+
+    def snapshot(self):
+        """Return a copy of the current state of this solver, unaffected by
+        any further solving, which may be passed to restore() later"""
+        return self.fork()
+
+    def restore(self, snapshot):
+        """Return this solver to the state saved by snapshot()"""
+        self.__dict__.update(snapshot.fork().__dict__)
+        for f in list(self.forms.values()) + list(self._input_only_forms.values()):
+            f._solver = self
+
+    def to_state(self):
+        """
+        Return a JSON-serializable dict capturing the state of this solver
+        after solve() or resolve(): its inputs, the forms it added, the values
+        it solved (as strings), and which fields are waiting on which missing
+        inputs and values. from_state() turns it back into an equivalent
+        solver, without attempting any fields. If solving stopped early (see
+        blocked_by()), the fields it had yet to attempt are included, so that
+        resolve() finishes the solve, but why it stopped is not.
+        """
+        assert self._done_solving
+
+        def dependencies(tracker):
+            return {dep: [f.name() for f in tracker.unmet_dependents(dep)] for dep in tracker.unmet_dependencies()}
+
+        return {
+            'format': STATE_FORMAT,
+            'solver': type(self).__name__,
+            'key': self.dependency_cache_key(self._form_names, self._field_names),
+            'record_dependencies': self._record_dependencies,
+            'collect_dependencies': self._collect_dependencies,
+            'query_only': self._query_only,
+            'warm_started': self._warm_started,
+            'solved': self._solved,
+            'inputs': self._i.to_dict(),
+            'input_forms': list(self._input_only_forms.keys()),
+            'forms': list(self.forms.keys()),
+            'values': {name: self._field_map[name].to_string(value) for name, value in self._v.items()},
+            'solving_fields': sorted(self._solving_fields, key=sort_keys),
+            'unimplemented_fields': list(self._unimplemented_fields),
+            'unattempted_fields': [f.name() for f in self._queued_fields()],
+            'field_dependencies': dependencies(self._field_dependencies),
+            'input_dependencies': dependencies(self._input_dependencies),
+            'met_field_dependencies': self._field_dependencies.met_dependencies(),
+            'met_input_dependencies': self._input_dependencies.met_dependencies(),
+            'reads': {name: [sorted(input_reads), sorted(value_reads)] for name, (input_reads, value_reads) in self._reads.items()},
+            'missing': {name: sorted(missing) for name, missing in self._missing.items()},
+            'waiting': dict(self._waiting),
+            'speculative': sorted(self._speculative),
+            'stats': dict(self._stats),
+        }
+
+    @classmethod
+    def from_state(cls, state, form_list, prompt=None):
+        """
+        Return a solver of this class (or a subclass) recreated from a dict
+        returned by to_state(), using the forms in `form_list`, which must be
+        for the same tax year(s) and version of HabuTax. Raises ValueError if
+        `state` can't be used.
+        """
+        if state.get('format') != STATE_FORMAT:
+            raise ValueError('Unsupported solver state format')
+        solver_class = {c.__name__: c for c in [cls] + _subclasses(cls)}.get(state['solver'])
+        if solver_class is None:
+            raise ValueError(f'Solver state was saved by a {state["solver"]}, not a {cls.__name__}')
+
+        input_config = configparser.ConfigParser()
+        input_config.read_dict(state['inputs'])
+        solver = solver_class(inputs.InputStore(input_config), form_list, prompt=prompt,
+                              record_dependencies=state['record_dependencies'])
+        solver._collect_dependencies = state['collect_dependencies']
+        key = state['key']
+        if key != solver.dependency_cache_key(key['forms'], key['fields']):
+            raise ValueError('Solver state was saved for different tax year(s) or a different version of HabuTax')
+
+        solver._form_names = list(key['forms'])
+        solver._field_names = list(key['fields'])
+        solver._query_only = state['query_only']
+        solver._warm_started = state['warm_started']
+        for form_name in state['input_forms']:
+            solver._add_form(form_name, input_only=True)
+        for form_name in state['forms']:
+            solver._add_form(form_name, schedule_required=False)
+
+        field_map = solver._field_map
+        for name, string in state['values'].items():
+            solver._v[name] = field_map[name].from_string(string)
+        solver._solving_fields = set(state['solving_fields'])
+        solver._unimplemented_fields = list(state['unimplemented_fields'])
+        for tracker, dependencies in [(solver._field_dependencies, state['field_dependencies']),
+                                      (solver._input_dependencies, state['input_dependencies'])]:
+            for dep, dependents in dependencies.items():
+                for dependent in dependents:
+                    tracker.add_unmet(dep, field_map[dependent])
+        # Only saved since solving stopped early was supported
+        for tracker, met in [(solver._field_dependencies, state.get('met_field_dependencies', [])),
+                             (solver._input_dependencies, state.get('met_input_dependencies', []))]:
+            for dep in met:
+                tracker.meet(dep)
+        # Pushed in reverse so that fields with equal sort keys pop in the
+        # same order as before
+        for name in reversed(state.get('unattempted_fields', [])):
+            solver._add_unattempted(field_map[name])
+        solver._reads = {name: (set(input_reads), set(value_reads)) for name, (input_reads, value_reads) in state['reads'].items()}
+        solver._missing = {name: set(missing) for name, missing in state['missing'].items()}
+        solver._waiting = dict(state['waiting'])
+        solver._speculative = set(state['speculative'])
+        solver._stats = Counter(state['stats'])
+
+        solver._done_solving = True
+        solver._solved = state['solved']
+        return solver
+
+    def _queued_fields(self):
+        """Return the fields waiting to be attempted, in the order they will
+        be"""
+        return self._unattempted_fields.fields()
+
+    def _dependency_cache_key(self):
+        return self.dependency_cache_key(self._form_names, self._field_names)
+
+    def warm_started(self):
+        """Return True if solve() used one of the dependency caches it was
+        given as `warm_start`"""
+        return self._warm_started
+
+    def _input_shape(self):
+        """Return a dict mapping the names of the integer, boolean, and enum
+        inputs any field read to (the string representation of) their values.
+        These typically decide which forms and fields a return needs."""
+        shape_types = (inputs.IntegerInput, inputs.BooleanInput, inputs.EnumInput)
+        shape = {}
+        for input_reads, _ in self._reads.values():
+            for input_name in input_reads:
+                if isinstance(self._input_map.get(input_name), shape_types) and input_name in self._i:
+                    shape[input_name] = str(self._i[input_name])
+        return dict(sorted(shape.items()))
+
+    def dependency_cache(self):
+        """
+        After a successful solve, return a (JSON-serializable) dict describing
+        the forms it needed and the order in which it solved their fields. It
+        is keyed by the tax year, HabuTax version, requested forms/fields, and
+        the input values which determine the shape of the return, and can be
+        passed to solve() as `warm_start` for a later solve of the same shape.
+        """
+        assert self._solved
+        forms = list(self.forms.keys())
+        return {
+            'key': self._dependency_cache_key(),
+            'shape': self._input_shape(),
+            'input_forms': sorted(set([n.split('.')[0] for n in self._input_map]) - set(forms), key=sort_keys),
+            'forms': forms,
+            'fields': [name for name in self._v.keys() if name in self._solving_fields],
+        }
+
+    def save_dependency_cache(self, filename):
+        with open(filename, 'w') as outfile:
+            json.dump(self.dependency_cache(), outfile, indent=1)
+
+    def _warm_start(self, cache):
+        """Add the forms from dependency cache `cache` and attempt its fields
+        in order, if it is applicable to this solve. Returns True if it was."""
+        if cache.get('key') != self._dependency_cache_key():
+            return False
+
+        try:
+            for input_name, value in cache['shape'].items():
+                if input_name not in self._input_map:
+                    self._add_input_spec(input_name)
+                if str(self._i[input_name]) != value:
+                    return False
+        except (inputs.MissingInput, inputs.InvalidInput, NotImplementedError):
+            return False
+
+        self._warm_started = True
+        for form_name in cache['input_forms']:
+            self._add_form(form_name, input_only=True)
+        for form_name in cache['forms']:
+            self._add_form(form_name, schedule_required=False)
+
+        try:
+            self._run_plan([name for name in cache['fields'] if name in self._field_map])
+        finally:
+            # Even if solving is stopped part-way through the plan, so that
+            # resolve() can carry on
+            for warm_form in list(self.forms.values()):
+                self._schedule_required(warm_form)
+        return True
+
+    @_traced('plan', lambda field_names: f'{len(field_names)} planned fields')
+    def _run_plan(self, field_names):
+        """
+        Solve the fields named in `field_names`, which are expected to be in
+        an order in which each field's dependencies are solved before it, in a
+        tight loop (without any of the bookkeeping needed to wait on missing
+        dependencies). If a field turns out to need something not yet solved
+        (i.e. because a different branch was taken this time), it and all
+        remaining fields are attempted normally instead. The time and attempt
+        budgets are checked before each field as usual; since each field is
+        only attempted once, it can't be retried too many times, and fields
+        which fail (e.g. are unimplemented, for `fail_fast`) are left to be
+        attempted normally.
+        """
+        planned = []
+        for field_name in field_names:
+            if field_name not in self._solving_fields:
+                self._solving_fields.add(field_name)
+                planned.append(self._field_map[field_name])
+
+        solved = 0
+        for field in planned:
+            name = field.name()
+            if self._limited:
+                try:
+                    self._check_limits(field)
+                except _StopSolving:
+                    # _check_limits() queued this field, but not those after
+                    # it (all of those before it were solved)
+                    self._add_unattempted(planned[solved + 1:])
+                    raise
+            input_reads = set()
+            value_reads = set()
+            self._reads[name] = (input_reads, value_reads)
+            field_form = field.form()
+            try:
+                if self._profiler is not None:
+                    self._profiler.attempted(name)
+                self._v[name] = self._evaluate(field, form.FormAccessor(self._i, field_form, reads=input_reads),
+                                               form.FormAccessor(self._v, field_form, reads=value_reads))
+            except (values.UnmetDependency, inputs.MissingInput, inputs.MissingInputSpecification, fields.FieldNotImplemented):
+                break
+            solved += 1
+            self._stats['attempts'] += 1
+            if self._observers:
+                for observer in self._observers:
+                    observer.field_solved(name, self._v[name])
+
+        self._attempt_all(planned[solved:])
+
+    def update_inputs(self, updates):
+        """
+        Change inputs after a call to solve(). `updates` maps full input names
+        to their new (string) values, or to None to remove an input entirely.
+        Every solved field which read a changed input, whether directly or via
+        the values of other fields, is discarded so that the next call to
+        resolve() recomputes only those fields.
+        """
+        assert self._done_solving
+
+        changed = set()
+        # Changed inputs which already had a value, which may have been read
+        # by fields now waiting on something they no longer need
+        replaced = set()
+        for input_name, value in updates.items():
+            if input_name not in self._input_map:
+                self._add_input_spec(input_name)
+            if input_name in self._i:
+                replaced.add(input_name)
+            if value is None:
+                if input_name in self._i:
+                    del self._i[input_name]
+            else:
+                value = str(value)
+                if not self._input_map[input_name].valid(value):
+                    raise inputs.InvalidInput(input_name, value)
+                self._i[input_name] = value
+                if self._input_dependencies.is_unmet(input_name):
+                    self._input_dependencies.meet(input_name)
+            changed.add(input_name)
+
+        input_readers = {}
+        value_readers = {}
+        for field_name, (input_reads, value_reads) in self._reads.items():
+            for input_name in input_reads:
+                input_readers.setdefault(input_name, []).append(field_name)
+            for value_name in value_reads:
+                value_readers.setdefault(value_name, []).append(field_name)
+
+        dirty = _readers(changed, input_readers, value_readers)
+
+        # Fields still waiting on a dependency will be re-attempted once it is
+        # met. However, those which read an input whose value changed may no
+        # longer need it (e.g. if the change means a form is no longer used),
+        # so stop waiting and re-attempt them along with the solved and
+        # unimplemented fields. (Those which only read newly-supplied inputs
+        # found them missing, so can't have depended on their values.)
+        stale = _readers(replaced, input_readers, value_readers)
+        parked = {f.name() for f in self._field_dependencies.discard_dependents(stale)}
+        parked.update(f.name() for f in self._input_dependencies.discard_dependents(stale))
+        for field_name in sorted(dirty, key=sort_keys):
+            if field_name in self._v:
+                del self._v[field_name]
+            elif field_name in self._unimplemented_fields:
+                self._unimplemented_fields.remove(field_name)
+            elif field_name in parked:
+                self._waiting.pop(field_name, None)
+                self._speculative.discard(field_name)
+            else:
+                continue
+            self._add_unattempted(self._field_map[field_name])
+
+    def resolve(self):
+        """Continue solving after a call to update_inputs(), recomputing only
+        the fields affected by the changed inputs. Returns True if the
+        resulting solution is complete, like solve()."""
+        self._start_resolving()
+        self._solve_loop()
+        return self._stop_resolving()
+
+    def _start_resolving(self):
+        assert self._done_solving
+        self._done_solving = False
+        self._solved = False
+        self._blocked_by = None
+        self._refused_input = self._prompt is None and self._batch_prompt is None
+        self._declined_inputs = set()
+        self._start_run()
+
+    def _stop_resolving(self):
+        if self._blocked_by is None:
+            self._discard_unreachable()
+        return self._finish_solving()
+
+    def _solve_loop(self):
+        if self._blocked_by is not None:
+            return
+        with self._stoppable():
+            self._run_attempts()
+            while self._release_speculative():
+                self._run_attempts()
+
+    def _run_attempts(self):
         while len(self._unattempted_fields) > 0 \
                 or self._input_dependencies.has_met() \
                 or (self._input_dependencies.has_unmet() and not self._refused_input) \
                 or self._field_dependencies.has_met():
 
+            self._stats['iterations'] += 1
             while len(self._unattempted_fields) > 0:
-                self._attempt_field(self._unattempted_fields.pop())
-            for field in sorted(self._field_dependencies.met_dependents(), key=sort_keys):
-                self._attempt_field(field)
-            if not self._refused_input:
+                self._attempt_next()
+            met = sorted(self._field_dependencies.met_dependents(), key=sort_keys)
+            self._attempt_all([field for field in met if self._released(field)])
+            if not self._refused_input and self._batch_prompt is not None:
+                # Only ask once nothing else can be solved, so that the batch
+                # includes every input which will be needed by then
+                if len(self._unattempted_fields) == 0 and not self._field_dependencies.has_met() \
+                        and not self._input_dependencies.has_met():
+                    self._prompt_batch(sorted(self._input_dependencies.unmet_dependencies(), key=sort_keys))
+            elif not self._refused_input:
                 for input_name in sorted(self._input_dependencies.unmet_dependencies(), key=sort_keys):
                     needed_by = self._input_dependencies.unmet_dependents(input_name)
                     self._attempt_input(input_name, needed_by)
@@ -264,15 +1427,25 @@ class Solver(object):
             # Must be list() because _attempt_field modifies
             # input_dependencies, and we don't want to get stuck in a loop
             # waiting for an input we can't provide without polling user for it
-            for field in list(self._input_dependencies.met_dependents()):
-                self._attempt_field(field)
+            met = list(self._input_dependencies.met_dependents())
+            self._attempt_all([field for field in met if self._released(field)])
+
+    def _attempt_next(self):
+        self._attempt_field(self._unattempted_fields.pop())
+
+    def _finish_solving(self):
+        self._done_solving = True
+        self._stats['time'] += time.perf_counter() - self._run_started
+        if self._progress is not None:
+            self._report_progress()
+        if self._blocked_by is not None:
+            self._solved = False
+            return False
 
         assert len(self._unattempted_fields) == 0
         assert not self._input_dependencies.has_met()
         assert not self._field_dependencies.has_met()
 
-        self._done_solving = True
-
         if not self._field_dependencies.has_unmet() \
                 and not self._input_dependencies.has_unmet() \
                 and len(self._unimplemented_fields) == 0:
@@ -280,12 +1453,76 @@ class Solver(object):
 
         return self._solved
 
+    def _reachable_fields(self):
+        """Return the names of the forms and fields reachable from those
+        requested in solve(), following the values each field read when it
+        was last attempted"""
+        reachable_forms = set()
+        reachable_fields = set()
+        stack = list(self._field_names)
+        for form_name in self._form_names:
+            reachable_forms.add(form_name)
+            stack.extend([f.name() for f in self.forms[form_name].required_fields()])
+
+        while len(stack) > 0:
+            field_name = stack.pop()
+            if field_name in reachable_fields or field_name not in self._field_map:
+                continue
+            reachable_fields.add(field_name)
+
+            form_name, _ = field_name.split('.')
+            if form_name not in reachable_forms and form_name in self.forms:
+                reachable_forms.add(form_name)
+                if not self._query_only:
+                    stack.extend([f.name() for f in self.forms[form_name].required_fields()])
+            if field_name in self._reads:
+                stack.extend(self._reads[field_name][1])
+
+        return reachable_forms, reachable_fields
+
+    def _discard_unreachable(self):
+        """Forget any forms and field values which are no longer needed by the
+        requested forms/fields (i.e. because changed inputs caused a different
+        branch of a calculation to be taken)"""
+        reachable_forms, reachable_fields = self._reachable_fields()
+
+        for form_name in list(self.forms.keys()):
+            if form_name not in reachable_forms:
+                for f in self.forms[form_name].fields():
+                    del self._field_map[f.name()]
+                del self.forms[form_name]
+
+        unreachable = self._solving_fields - reachable_fields
+        for field_name in unreachable:
+            if field_name in self._v:
+                del self._v[field_name]
+            self._reads.pop(field_name, None)
+        self._solving_fields -= unreachable
+        self._unimplemented_fields = [f for f in self._unimplemented_fields if f not in unreachable]
+        self._field_dependencies.discard_dependents(unreachable)
+        self._input_dependencies.discard_dependents(unreachable)
+        for field_name in unreachable:
+            self._waiting.pop(field_name, None)
+            self._missing.pop(field_name, None)
+
     def solution(self):
         """Return a ConfigParser object representing the portions of the
         requested forms which were successfully solved"""
         assert self._done_solving
         return self._v.to_config(self._field_map)
 
+    def solved(self):
+        """Return True if the last call to solve() or resolve() completely
+        solved the requested forms"""
+        assert self._done_solving
+        return self._solved
+
+    def input_spec(self, input_name):
+        """Return the Input object for the input named `input_name`"""
+        if input_name not in self._input_map:
+            self._add_input_spec(input_name)
+        return self._input_map[input_name]
+
     def unimplemented_fields(self):
         """Return a list of the unimplemented field names after a call to
         solve()"""
@@ -312,3 +1549,243 @@ class Solver(object):
         solve()"""
         assert self._done_solving
         return self._unmet_dependencies(self._field_dependencies)
+
+    def stats(self):
+        """Return a dict of counters describing the work done by the solver,
+        including the field attempts made and the UnmetDependency,
+        MissingInput, and MissingInputSpecification exceptions they raised (or,
+        in `collect_dependencies` mode, the attempts which found missing
+        dependencies). In `record_dependencies` and `collect_dependencies`
+        modes, this also counts the attempts (and exceptions) which were
+        avoided by waiting on several dependencies at once. 'prompts' counts
+        the calls made to `prompt` or `batch_prompt`.
+
+        To show how much work was wasted on retries, it also includes:
+        'forms' (the form objects created, including input-only ones),
+        'fields' (the distinct fields attempted), 'wasted_attempts' (those
+        which found the value of another field missing), 'input_spec_retries'
+        (those repeated after loading a missing input specification),
+        'iterations' (of the solver's outer loop), 'peak_queue' (the most
+        fields waiting to be attempted at once), and 'time' (the seconds
+        spent in solve(), resolve(), and query()).
+        """
+        stats = {key: 0 for key in ['attempts', 'exceptions', 'attempts_saved', 'exceptions_saved', 'prompts',
+                                    'forms', 'fields', 'wasted_attempts', 'input_spec_retries', 'iterations',
+                                    'peak_queue', 'time']}
+        stats.update(self._stats)
+        stats['fields'] = len(self._reads)
+        return stats
+
+    def read_inputs(self):
+        """Return the set of names of the inputs read by any field the last
+        time it was attempted (whether or not they were supplied)"""
+        read = set()
+        for input_reads, _ in self._reads.values():
+            read |= input_reads
+        return read
+
+    def dependency_trace(self):
+        """Return a dict mapping the name of each attempted field to a dict
+        of the sorted names of the 'inputs' and 'values' it read the last time
+        it was attempted, and (in `record_dependencies` mode) the names of
+        all the inputs and values it ever found 'missing'"""
+        trace = {}
+        for field_name, (input_reads, value_reads) in self._reads.items():
+            trace[field_name] = {
+                'inputs': sorted(input_reads, key=sort_keys),
+                'values': sorted(value_reads, key=sort_keys),
+                'missing': sorted(self._missing.get(field_name, []), key=sort_keys),
+            }
+        return trace
+
+
+class PullSolver(Solver):
+    """
+    A Solver which evaluates fields on demand: when a field reads the value of
+    another field which has not yet been solved, that field is attempted
+    immediately (recursively) rather than the reading field raising
+    UnmetDependency and being re-attempted later. Fields which still can't be
+    solved (i.e. because of a missing input) are waited on as in Solver, so
+    the results are the same, but far fewer field attempts are thrown away.
+    """
+    def __init__(self, input_config, form_list, prompt=None, record_dependencies=False, batch_prompt=None):
+        super().__init__(input_config, form_list, prompt=prompt, record_dependencies=record_dependencies, batch_prompt=batch_prompt)
+
+        # Names of the fields waiting in _unattempted_fields which have not
+        # since been pulled, and of those currently being evaluated (to avoid
+        # recursing forever if fields depend on each other)
+        self._queued = set()
+        self._evaluating = set()
+
+    def _add_unattempted(self, unattempted):
+        if isinstance(unattempted, list):
+            self._queued.update([f.name() for f in unattempted])
+        else:
+            self._queued.add(unattempted.name())
+        super()._add_unattempted(unattempted)
+
+    def _attempt_next(self):
+        field = self._unattempted_fields.pop()
+        # Otherwise, this field was already pulled by another field
+        if field.name() in self._queued:
+            self._queued.remove(field.name())
+            self._attempt_field(field)
+
+    def _attempt_field(self, field):
+        self._evaluating.add(field.name())
+        try:
+            super()._attempt_field(field)
+        finally:
+            self._evaluating.discard(field.name())
+
+    def _queued_fields(self):
+        return [f for f in super()._queued_fields() if f.name() in self._queued]
+
+    def fork(self):
+        forked = super().fork()
+        forked._queued = set(self._queued)
+        forked._evaluating = set()
+        return forked
+
+    def _values_accessor(self, field, value_reads):
+        return form.PullingAccessor(self._v, field.form(), self._pull, reads=value_reads)
+
+    def _pull(self, field_name):
+        """Attempt the field named `field_name` now, if it hasn't been yet"""
+        if field_name in self._evaluating:
+            return
+        self._need_field(field_name)
+        if field_name in self._queued:
+            self._queued.remove(field_name)
+            self._attempt_field(self._field_map[field_name])
+
+
+class AsyncSolver(Solver):
+    """
+    A Solver for use with asyncio, whose `prompt` is a coroutine function
+    (called with the same arguments as Solver's, and returning the same
+    `(value, supplied)` tuple). Rather than asking for missing inputs one at a
+    time, it asks for every missing input it knows of at once (or at most
+    `max_prompts` at a time), and keeps solving whatever each answer unblocks
+    while waiting for the rest, asking for any further inputs that turns up
+    straight away. solve(), resolve(), and query() are coroutines. If any
+    input is not supplied, no further inputs are asked for, though prompts
+    already waiting are still awaited.
+    """
+    def __init__(self, input_config, form_list, prompt=None, record_dependencies=False, max_prompts=None):
+        super().__init__(input_config, form_list, prompt=prompt, record_dependencies=record_dependencies)
+        self._max_prompts = max_prompts
+
+    async def solve(self, form_names, field_names=[], warm_start=None):
+        self._start_run()
+        self._start_solving(form_names, field_names, warm_start)
+        await self._gather_inputs()
+        return self._stop_solving(False)
+
+    async def resolve(self):
+        self._start_resolving()
+        await self._gather_inputs()
+        return self._stop_resolving()
+
+    async def query(self, field_names):
+        self._start_query(field_names)
+        await self._gather_inputs()
+        return self._stop_query(field_names)
+
+    async def _gather_inputs(self):
+        """Solve as far as possible, prompting concurrently for the missing
+        inputs and continuing each time one of them is supplied"""
+        refused = self._refused_input
+        pending = {}
+        try:
+            while True:
+                # Solve everything which doesn't need an input still missing,
+                # without prompting synchronously
+                self._refused_input = True
+                self._solve_loop()
+                if self._blocked_by is not None:
+                    break
+
+                if not refused:
+                    prompting = set(pending.values())
+                    for input_name in sorted(self._input_dependencies.unmet_dependencies(), key=sort_keys):
+                        if self._max_prompts is not None and len(pending) >= self._max_prompts:
+                            break
+                        if input_name in prompting:
+                            continue
+                        needed_by = self._input_dependencies.unmet_dependents(input_name)
+                        if self._observers:
+                            self._notify_input_requested(input_name, needed_by)
+                        prompt = self._prompt(self._input_map[input_name], list(needed_by))
+                        pending[asyncio.ensure_future(prompt)] = input_name
+                        self._stats['prompts'] += 1
+                if len(pending) == 0:
+                    break
+
+                done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: sort_keys(pending[t])):
+                    input_name = pending.pop(task)
+                    value, supplied = task.result()
+                    if supplied:
+                        assert self._input_map[input_name].valid(value)
+                        self._i[input_name] = value
+                        self._input_dependencies.meet(input_name)
+                    else:
+                        refused = True
+        finally:
+            for task in pending:
+                task.cancel()
+            self._refused_input = refused
+
+
+class SolveSession(object):
+    """
+    A solve which stopped because it needs inputs which were not supplied,
+    returned by Solver.solve() when called with `suspend=True`. Once those
+    inputs are known, resume() continues from where solving stopped, only
+    attempting the fields which were waiting on them (and anything depending
+    on those). Sessions can be saved to disk with save() and later picked up
+    with load(), i.e. by a different process.
+    """
+    def __init__(self, solver):
+        self.solver = solver
+
+    def needed_inputs(self):
+        """Return a dict mapping the names of the inputs the solve is waiting
+        for to their Input objects"""
+        unmet = self.solver.unmet_input_dependencies()
+        return {name: self.solver.input_spec(name) for name in sorted(unmet, key=sort_keys)}
+
+    def resume(self, updates):
+        """
+        Supply inputs (a dict mapping full input names to their string values,
+        as for Solver.update_inputs()) and continue solving. Like solve(),
+        this returns True or False, or this session if further inputs are
+        needed.
+        """
+        self.solver.update_inputs(updates)
+        solved = self.solver.resolve()
+        if len(self.solver.unmet_input_dependencies()) > 0:
+            return self
+        return solved
+
+    def to_dict(self):
+        """Return a JSON-serializable dict describing this session (see
+        Solver.to_state())"""
+        return self.solver.to_state()
+
+    @classmethod
+    def from_dict(cls, state, form_list, prompt=None):
+        """Recreate a session from a dict returned by to_dict(), using the
+        forms in `form_list`"""
+        return cls(Solver.from_state(state, form_list, prompt=prompt))
+
+    def save(self, filename):
+        with open(filename + '.tmp', 'w') as outfile:
+            json.dump(self.to_dict(), outfile)
+        os.replace(filename + '.tmp', filename)
+
+    @classmethod
+    def load(cls, filename, form_list, prompt=None):
+        with open(filename) as infile:
+            return cls.from_dict(json.load(infile), form_list, prompt=prompt)
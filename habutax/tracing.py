@@ -0,0 +1,97 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+from habutax.solver import SolverObserver
+
+
+def span(tracer, name, category, **args):
+    """Return tracer.span(name, category, **args), or a context manager which
+    does nothing if `tracer` is None"""
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.span(name, category, **args)
+
+
+class Tracer(SolverObserver):
+    """
+    Records a timeline of spans in the Trace Event Format read by Perfetto and
+    chrome://tracing. Once attached to a Solver (see attach()), it records a
+    span for each form added, field attempt, and prompt, and annotates each
+    field attempt with its outcome (whether it was solved, or what it is
+    waiting for), which shows the order in which the retry-based solver
+    actually did things.
+    """
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._start = clock()
+        self._pid = os.getpid()
+        self._events = []
+
+        # The name and args of each span currently open, innermost last, so
+        # that solver events can be added to the attempt they happened in
+        self._open = []
+
+    def _timestamp(self, t):
+        """Convert a clock reading to microseconds since the trace started"""
+        return (t - self._start) * 1000000
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        """Record the time spent in the `with` block as a span. Yields the
+        span's args dict, to which more details may be added."""
+        self._open.append((name, args))
+        start = self._clock()
+        try:
+            yield args
+        finally:
+            end = self._clock()
+            self._open.pop()
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': self._timestamp(start),
+                'dur': (end - start) * 1000000,
+                'pid': self._pid,
+                'tid': threading.get_ident(),
+            }
+            if len(args) > 0:
+                event['args'] = args
+            self._events.append(event)
+
+    def attach(self, solver):
+        """Trace the work done by `solver`"""
+        solver.set_tracer(self)
+        solver.add_observer(self)
+
+    def _attempt_args(self, field_name):
+        """Return the args of the span of the attempt of `field_name`, if
+        it is the innermost span"""
+        if len(self._open) > 0 and self._open[-1][0] == field_name:
+            return self._open[-1][1]
+        return {}
+
+    def field_solved(self, field_name, value):
+        # Not the value itself, which would put the taxpayer's data in traces
+        self._attempt_args(field_name)['solved'] = True
+
+    def field_blocked(self, field_name, dependency):
+        self._attempt_args(field_name).setdefault('waiting_for', []).append(dependency)
+
+    def field_unimplemented(self, field_name, message):
+        self._attempt_args(field_name)['unimplemented'] = message
+
+    def events(self):
+        """Return the recorded events, in the order their spans ended"""
+        return list(self._events)
+
+    def to_dict(self):
+        return {'traceEvents': self.events(), 'displayTimeUnit': 'ms'}
+
+    def write(self, filename):
+        """Write the trace to `filename` as JSON"""
+        with open(filename, 'w') as outfile:
+            json.dump(self.to_dict(), outfile)
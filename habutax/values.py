@@ -7,11 +7,119 @@ class UnmetDependency(Exception):
         self.message = message_fmt.format(dependency=dependency_name)
         super().__init__(self.message)
 
+class Placeholder(object):
+    """
+    Stands in for a missing input or value so that a field's value function
+    can keep running to discover its other dependencies. Arithmetic and
+    comparisons involving a placeholder produce the placeholder again. Any
+    operation which lets a placeholder decide control flow or turn into a
+    concrete value (truth testing, conversion to int/float/str, iteration,
+    etc.) tells the DependencyCollector it is no longer certain which keys a
+    real evaluation would read.
+    """
+
+    def __init__(self, collector):
+        self._collector = collector
+
+    def _self(self, *args, **kwargs):
+        return self
+
+    __add__ = __radd__ = __sub__ = __rsub__ = _self
+    __mul__ = __rmul__ = __truediv__ = __rtruediv__ = _self
+    __floordiv__ = __rfloordiv__ = __mod__ = __rmod__ = _self
+    __pow__ = __rpow__ = __neg__ = __pos__ = __abs__ = __round__ = _self
+    __and__ = __rand__ = __or__ = __ror__ = __xor__ = __rxor__ = _self
+    __lt__ = __le__ = __gt__ = __ge__ = __eq__ = __ne__ = _self
+    __call__ = __getitem__ = _self
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self
+
+    def __bool__(self):
+        self._collector.branched = True
+        return False
+
+    def __int__(self):
+        self._collector.branched = True
+        return 0
+
+    __index__ = __int__
+
+    def __float__(self):
+        self._collector.branched = True
+        return 0.0
+
+    def __str__(self):
+        self._collector.branched = True
+        return ''
+
+    def __format__(self, format_spec):
+        return str(self)
+
+    def __iter__(self):
+        self._collector.branched = True
+        return iter(())
+
+    def __hash__(self):
+        self._collector.branched = True
+        return id(self)
+
+class DependencyCollector(object):
+    """
+    Collects the names of the inputs and values found missing while
+    evaluating a field with Placeholders standing in for them. Only keys read
+    before any placeholder influenced control flow are certain to be needed by
+    a real evaluation, so later ones are not collected.
+
+    Not every such influence can be detected: an `is` comparison (as in
+    `i['1040.filing_status'] is filing_status.Single`) can't be intercepted.
+    So that inputs a real evaluation might never read are never asked for, an
+    input is only collected if it is the first key found missing, and nothing
+    is collected after it. Values, which are only waited on, are still
+    collected until a placeholder is known to have influenced control flow.
+    """
+
+    def __init__(self):
+        self.branched = False
+        self.values = []
+        self.inputs = []
+
+    def missing_value(self, key):
+        if not self.branched and key not in self.values:
+            self.values.append(key)
+        return Placeholder(self)
+
+    def missing_input(self, key):
+        if not self.found_missing() and not self.branched:
+            self.inputs.append(key)
+        self.branched = True
+        return Placeholder(self)
+
+    def found_missing(self):
+        return len(self.values) + len(self.inputs) > 0
+
 class ValueStore(MutableMapping):
     def __init__(self, *args, **kwargs):
         self.values = dict()
+        # Set if self.values may be shared with a copy of this store
+        self._shared = False
         self.update(dict(*args, **kwargs))
 
+    def copy(self):
+        """Return a copy of this store. The two share the same values until
+        either is modified."""
+        other = ValueStore()
+        other.values = self.values
+        other._shared = self._shared = True
+        return other
+
+    def _unshare(self):
+        if self._shared:
+            self.values = dict(self.values)
+            self._shared = False
+
     def __getitem__(self, key):
         try:
             return self.values[key]
@@ -19,11 +127,18 @@ class ValueStore(MutableMapping):
             raise UnmetDependency(key) from ke
 
     def __setitem__(self, key, value):
+        if self._shared:
+            self._unshare()
         self.values[key] = value
 
     def __delitem__(self, key):
+        if self._shared:
+            self._unshare()
         del self.values[key]
 
+    def __contains__(self, key):
+        return key in self.values
+
     def __iter__(self):
         return iter(self.values)
 
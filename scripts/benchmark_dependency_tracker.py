@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# Compares the scaling of habutax.solver.DependencyTracker against the
+# original list-based implementation it replaced. Each round follows the
+# pattern of calls Solver.solve() makes: a batch of dependents is added, the
+# dependencies are met by attempting other fields, the loop condition checks
+# has_unmet()/has_met() after each attempt, and then the met dependents are
+# released. Dependencies which are never met (i.e. unsupplied inputs) stay in
+# the tracker throughout.
+#
+# $ python scripts/benchmark_dependency_tracker.py --sizes 1000 10000 20000
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from habutax.solver import DependencyTracker
+
+class ListDependencyTracker(object):
+    """The original DependencyTracker, which scans its lists"""
+    def __init__(self):
+        self._unmet = {}
+        self._met = []
+
+    def add_unmet(self, dependency_name, dependent):
+        if dependency_name not in self._unmet:
+            self._unmet[dependency_name] = [dependent]
+        else:
+            self._unmet[dependency_name].append(dependent)
+
+    def has_met(self):
+        return len(self._met) > 0
+
+    def has_unmet(self):
+        for dependency, dependents in self._unmet.items():
+            if len(dependents) > 0 and dependency not in self._met:
+                return True
+        return False
+
+    def meet(self, dependency_name):
+        self._met.append(dependency_name)
+
+    def met_dependents(self):
+        while len(self._met) > 0:
+            met = self._met[0]
+            if met in self._unmet:
+                dependent = self._unmet[met].pop()
+                if len(self._unmet[met]) == 0:
+                    del self._unmet[met]
+                    self._met.pop(0)
+                yield dependent
+            else:
+                self._met.pop(0)
+                continue
+
+def run(tracker_cls, size, batch):
+    tracker = tracker_cls()
+    start = time.perf_counter()
+
+    released = 0
+    for first in range(0, size, batch):
+        names = [f'form.{n}' for n in range(first, min(size, first + batch))]
+        for name in names:
+            tracker.add_unmet(name, f'dependent_of.{name}')
+            tracker.add_unmet(f'missing.{name}', f'dependent_of.{name}')
+        for name in names:
+            tracker.meet(name)
+            tracker.has_unmet()
+            tracker.has_met()
+        released += len(list(tracker.met_dependents()))
+
+    elapsed = time.perf_counter() - start
+    assert released == size
+    assert tracker.has_unmet()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 20000], help='Numbers of dependencies to benchmark')
+    parser.add_argument('--batch', type=int, default=1000, help='Number of dependencies met per solver loop iteration')
+    args = parser.parse_args()
+
+    print(f'{"dependencies":>12} | {"list-based (s)":>14} | {"current (s)":>11}')
+    for size in args.sizes:
+        old = run(ListDependencyTracker, size, args.batch)
+        new = run(DependencyTracker, size, args.batch)
+        print(f'{size:>12} | {old:>14.4f} | {new:>11.4f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import unittest
+
+from habutax.inputs import *
+from habutax.fields import *
+from habutax.form import *
+from habutax.dependency_graph import DependencyGraph
+from habutax.forms import ty2023
+
+from .test_solver import TestForm, CountingTestForm, ItemTestForm, ItemTotalTestForm
+
+
+class CycleTestForm(Form):
+    form_name = "cycle"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        def helper(self, i, v):
+            return v['second'] + v['item_total.missing']
+
+        test_fields = [
+            IntegerField('first', lambda s, i, v: helper(s, i, v)),
+            IntegerField('second', lambda s, i, v: v['first']),
+        ]
+        super().__init__(__class__, [], test_fields, [], **kwargs)
+
+
+class DependencyGraphTestCase(unittest.TestCase):
+    def setUp(self):
+        self.graph = DependencyGraph([TestForm, CountingTestForm, ItemTestForm, ItemTotalTestForm, CycleTestForm])
+
+    def test_reads(self):
+        reads = self.graph.reads('test.else')
+        self.assertEqual(reads.inputs, {'test.bar'})
+        self.assertEqual(reads.values, {'test.something'})
+        self.assertFalse(reads.dynamic)
+
+        # Form instances are ignored, and f-strings become wildcards
+        reads = self.graph.reads('item_total.total')
+        self.assertEqual(reads.inputs, {'item_total.number_items'})
+        self.assertEqual(reads.values, {'item.amount'})
+
+        # Value functions built at runtime cannot be analyzed
+        self.assertTrue(self.graph.reads('counting.total').dynamic)
+
+    def test_input_form(self):
+        self.assertEqual(self.graph.fields('item'), ['item.amount'])
+        self.assertEqual(self.graph.reads('item.amount').inputs, {'item.amount'})
+
+    def test_dependencies(self):
+        self.assertEqual(self.graph.dependencies('item_total.total'), {'item.amount'})
+        self.assertEqual(self.graph.dependents('item.amount'), {'item_total.total', 'item_total.largest'})
+        self.assertEqual(self.graph.form_dependencies('item_total'), {'item'})
+        self.assertEqual(self.graph.dependencies('cycle.first'), {'cycle.second'})
+
+        order = self.graph.order()
+        self.assertEqual(sorted(order), sorted(self.graph.fields()))
+        self.assertLess(order.index('test.something'), order.index('test.else'))
+
+    def test_problems(self):
+        self.assertEqual(self.graph.cycles(), [['cycle.first', 'cycle.second']])
+        self.assertEqual(self.graph.dangling(), [('cycle.first', 'item_total.missing')])
+
+    def test_ty2023(self):
+        graph = ty2023.dependency_graph
+        self.assertIs(graph, ty2023.dependency_graph)
+        self.assertEqual(graph.cycles(), [])
+        self.assertIn('w-2.box_1', graph.dependencies('1040.1a'))
+        self.assertIn('w-2', graph.form_dependencies('1040'))
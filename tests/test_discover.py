@@ -0,0 +1,77 @@
+import unittest
+from configparser import ConfigParser
+
+from habutax.inputs import *
+from habutax.fields import *
+from habutax.form import *
+from habutax.discover import discover_inputs, _discover, _explore
+from habutax.solver import Solver
+
+from .test_solver import ItemTestForm
+
+
+class QuestionnaireTestForm(Form):
+    form_name = "questionnaire"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            StringInput('name'),
+            BooleanInput('has_pet'),
+            StringInput('pet_name'),
+            IntegerInput('number_items'),
+            BooleanInput('unsupported'),
+        ]
+        test_fields = [
+            StringField('name', lambda s, i, v: i['name']),
+            StringField('pet_name', lambda s, i, v: i['pet_name'] if i['has_pet'] else None),
+            IntegerField('total', lambda s, i, v: sum([v[f'item:{n}.amount'] for n in range(i['number_items'])])),
+            IntegerField('other', lambda s, i, v: v['missing_form.field'] if i['unsupported'] else 0),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class DiscoverInputsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+
+    def discover(self):
+        return list(discover_inputs(InputStore(self.config), [QuestionnaireTestForm, ItemTestForm], ['questionnaire']).keys())
+
+    def test_discover(self):
+        self.assertEqual(self.discover(), [
+            'item:0.amount',
+            'questionnaire.has_pet',
+            'questionnaire.name',
+            'questionnaire.number_items',
+            'questionnaire.pet_name',
+            'questionnaire.unsupported',
+        ])
+        self.assertEqual(self.config.sections(), [])
+
+    def test_partial(self):
+        self.config['questionnaire'] = {'name': 'Bob', 'has_pet': 'no', 'number_items': '0'}
+        self.assertEqual(self.discover(), [
+            'questionnaire.has_pet',
+            'questionnaire.name',
+            'questionnaire.number_items',
+            'questionnaire.unsupported',
+        ])
+
+    def test_changed_gating_input(self):
+        self.config['questionnaire'] = {'name': 'Bob', 'has_pet': 'yes', 'number_items': '0', 'unsupported': 'no'}
+        solver = Solver(InputStore(self.config), [QuestionnaireTestForm, ItemTestForm])
+        self.assertFalse(solver.solve(['questionnaire']))
+
+        # questionnaire.pet_name is no longer needed once has_pet changes
+        solver.update_inputs({'questionnaire.has_pet': 'no'})
+        solver.resolve()
+        discovered = {}
+        _discover(solver, discovered)
+        _explore(solver, discovered, set())
+        self.assertEqual(sorted(discovered), [
+            'questionnaire.has_pet',
+            'questionnaire.name',
+            'questionnaire.number_items',
+            'questionnaire.unsupported',
+        ])
@@ -0,0 +1,76 @@
+import io
+import tracemalloc
+import unittest
+from configparser import ConfigParser
+
+from habutax import enum
+from habutax import memory
+from habutax.inputs import *
+from habutax.fields import *
+from habutax.form import *
+from habutax.solver import Solver
+
+
+class MeasuredTestForm(Form):
+    form_name = "measured"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        choices = enum.make('Measured choices', {'A': 'first', 'B': 'second'})
+        test_inputs = [
+            IntegerInput('count', description="A long description, which is shared by all instances"),
+            EnumInput('choice', choices),
+        ]
+        test_fields = [
+            IntegerField('double', lambda s, i, v: 2 * i['count']),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class CountingTestForm(Form):
+    form_name = "counting"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_fields = [
+            IntegerField('total', lambda s, i, v: sum(v[f'measured:{n}.double'] for n in range(3))),
+        ]
+        super().__init__(__class__, [], test_fields, [], **kwargs)
+
+
+class MemoryTestCase(unittest.TestCase):
+    def solve(self):
+        config = ConfigParser()
+        for n in range(3):
+            config[f'measured:{n}'] = {'count': str(n)}
+        s = Solver(InputStore(config), [CountingTestForm, MeasuredTestForm])
+        self.assertTrue(s.solve(['counting']))
+        return s
+
+    def test_component_sizes(self):
+        sizes = dict(memory.component_sizes(self.solve()))
+        self.assertEqual(list(sizes), ['shared form specs', 'form counting', 'form measured:0', 'form measured:1',
+                                       'form measured:2', 'InputStore', 'ValueStore', 'dependency trackers', 'field reads',
+                                       'solver (other)'])
+        for size in sizes.values():
+            self.assertGreater(size, 0)
+
+        # The enum and input description are shared by all instances, so no
+        # instance is charged for them
+        self.assertEqual(sizes['form measured:1'], sizes['form measured:0'])
+
+    def test_report(self):
+        tracemalloc.start()
+        try:
+            s = self.solve()
+            out = io.StringIO()
+            memory.report(s, file=out)
+        finally:
+            tracemalloc.stop()
+        report = out.getvalue()
+        self.assertIn('forms: measured (x3)', report)
+        self.assertIn('Traced memory:', report)
+
+    def test_report_needs_tracing(self):
+        with self.assertRaises(RuntimeError):
+            memory.report(self.solve(), file=io.StringIO())
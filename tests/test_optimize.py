@@ -0,0 +1,65 @@
+import unittest
+from configparser import ConfigParser
+
+from habutax.inputs import *
+from habutax.fields import *
+from habutax.form import *
+from habutax.optimize import optimize
+
+
+class ElectionTestForm(Form):
+    form_name = "election"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            IntegerInput('income'),
+            IntegerInput('deductions'),
+            BooleanInput('itemize'),
+            BooleanInput('round_down'),
+            BooleanInput('unused'),
+        ]
+        test_fields = [
+            IntegerField('deduction', lambda s, i, v: i['deductions'] if i['itemize'] else 100),
+            IntegerField('tax', lambda s, i, v: (i['income'] - v['deduction']) // (100 if i['round_down'] else 1)),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class OptimizeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config['election'] = {'income': '1000', 'deductions': '300', 'itemize': 'no'}
+
+    def optimize(self, elections):
+        return optimize(InputStore(self.config), [ElectionTestForm], ['election'],
+                        elections=elections, total_tax_fields=['election.tax'])
+
+    def test_optimize(self):
+        outcomes = self.optimize(['election.itemize', 'election.round_down', 'election.unused'])
+        self.assertEqual([o.total_tax() for o in outcomes], [7, 9, 700, 900])
+        self.assertEqual(outcomes[0].choices, {'election.itemize': 'yes', 'election.round_down': 'yes'})
+        self.assertEqual(outcomes[0].taxes, {'election.tax': 7.0})
+        self.assertEqual(outcomes[0].solver.solution()['election']['deduction'], '300')
+        self.assertEqual(self.config['election']['itemize'], 'no')
+
+    def test_unsolved(self):
+        del self.config['election']['deductions']
+        self.config['election']['round_down'] = 'no'
+        outcomes = self.optimize(['election.itemize'])
+        self.assertEqual([o.solved for o in outcomes], [True, False])
+        self.assertEqual(outcomes[0].choices, {'election.itemize': 'no'})
+        self.assertIn('election.deductions', outcomes[1].solver.unmet_input_dependencies())
+
+    def test_change_election_after_unsolved(self):
+        del self.config['election']['deductions']
+        self.config['election']['round_down'] = 'no'
+        outcomes = self.optimize(['election.itemize'])
+
+        # Changing the election of the unsolved outcome no longer needs the
+        # missing input, so gives the same answer as the solved outcome
+        solver = outcomes[1].solver.fork()
+        solver.update_inputs({'election.itemize': 'no'})
+        self.assertTrue(solver.resolve())
+        self.assertEqual(solver.unmet_input_dependencies(), {})
+        self.assertEqual(solver.solution(), outcomes[0].solver.solution())
@@ -0,0 +1,104 @@
+import os
+import pstats
+import tempfile
+import unittest
+from configparser import ConfigParser
+
+from habutax.inputs import *
+from habutax.fields import *
+from habutax.form import *
+from habutax.profiling import Profiler
+from habutax.solver import Solver, PullSolver
+
+
+class ProfiledTestForm(Form):
+    form_name = "profiled"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            IntegerInput('a'),
+        ]
+        test_fields = [
+            IntegerField('total', lambda s, i, v: v['double'] + v['other.triple']),
+            IntegerField('double', lambda s, i, v: 2 * i['a']),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class OtherTestForm(Form):
+    form_name = "other"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_fields = [
+            IntegerField('triple', lambda s, i, v: 3 * i['profiled.a']),
+        ]
+        super().__init__(__class__, [], test_fields, [], **kwargs)
+
+
+class Clock(object):
+    """Advances by one second each time it is read"""
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config['profiled'] = {'a': '1'}
+
+    def solve(self, solver_class):
+        profiler = Profiler(clock=Clock())
+        s = solver_class(InputStore(self.config), [ProfiledTestForm, OtherTestForm])
+        s.set_profiler(profiler)
+        self.assertTrue(s.solve(['profiled']))
+        return profiler
+
+    def test_retry(self):
+        profiler = self.solve(Solver)
+        fields = {p.name: p for p in profiler.fields()}
+        # Waiting first for 'double', then for 'other.triple'
+        self.assertEqual(fields['profiled.total'].calls, 3)
+        self.assertEqual(fields['profiled.total'].attempts, 3)
+        self.assertEqual(fields['profiled.total'].exceptions['Unmet'], 2)
+        self.assertEqual(fields['other.triple'].calls, 1)
+        # Each call takes one tick of the clock
+        self.assertEqual(fields['profiled.total'].self_time, 3)
+        self.assertEqual(fields['profiled.total'].total_time, 3)
+        forms = {p.name: p for p in profiler.forms()}
+        self.assertEqual(forms['profiled'].calls, 4)
+        self.assertEqual(forms['profiled'].total_time, 4)
+
+    def test_pull(self):
+        profiler = self.solve(PullSolver)
+        fields = {p.name: p for p in profiler.fields()}
+        self.assertEqual(fields['profiled.total'].calls, 1)
+        self.assertEqual(fields['profiled.total'].exceptions['Unmet'], 0)
+        self.assertEqual(fields['profiled.double'].attempts, 1)
+        # 'total' pulls the other two, which take 1 tick each, in between
+        # the three ticks it takes itself
+        self.assertEqual(fields['profiled.total'].total_time, 5)
+        self.assertEqual(fields['profiled.total'].self_time, 3)
+        forms = {p.name: p for p in profiler.forms()}
+        self.assertEqual(forms['profiled'].total_time, 5)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'profile.pstats')
+            profiler.write_pstats(filename)
+            stats = pstats.Stats(filename).stats
+            total = [key for key in stats if key[2] == 'profiled.total'][0]
+            double = [key for key in stats if key[2] == 'profiled.double'][0]
+            self.assertTrue(total[0].endswith('test_profiling.py'))
+            self.assertEqual(stats[double][4], {total: (1, 1, 1, 1)})
+
+            filename = os.path.join(tmpdir, 'profile.folded')
+            profiler.write_collapsed(filename)
+            with open(filename) as infile:
+                lines = infile.read().splitlines()
+            self.assertIn('solve;profiled.total;profiled.double 1000000', lines)
+            self.assertIn('solve;profiled.total 3000000', lines)
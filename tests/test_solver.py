@@ -1,10 +1,13 @@
+import asyncio
+import tempfile
 import unittest
 from configparser import ConfigParser
 
+from habutax import enum
 from habutax.inputs import *
 from habutax.fields import *
 from habutax.form import *
-from habutax.solver import Solver, DependencyTracker, sort_keys
+from habutax.solver import Solver, PullSolver, AsyncSolver, PlanCache, SolveSession, SolveLimitExceeded, Livelock, SolverObserver, DependencyTracker, WorkQueue, sort_keys
 
 
 class TestForm(Form):
@@ -23,6 +26,70 @@ class TestForm(Form):
         super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
 
 
+class CountingTestForm(Form):
+    form_name = "counting"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            IntegerInput('a'),
+            IntegerInput('b'),
+            BooleanInput('use_other'),
+        ]
+
+        def counted(name, fn):
+            def value_fn(s, i, v):
+                CountingTestForm.attempts[name] = CountingTestForm.attempts.get(name, 0) + 1
+                return fn(s, i, v)
+            return value_fn
+
+        test_fields = [
+            IntegerField('a_double', counted('a_double', lambda s, i, v: 2 * i['a'])),
+            IntegerField('b_double', counted('b_double', lambda s, i, v: 2 * i['b'])),
+            IntegerField('total', counted('total', lambda s, i, v: v['a_double'] + v['b_double'])),
+            IntegerField('other', counted('other', lambda s, i, v: v['test.something'] if i['use_other'] else None)),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class ItemTestForm(InputForm):
+    form_name = "item"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            IntegerInput('amount'),
+        ]
+        super().__init__(__class__, test_inputs, **kwargs)
+
+
+class ItemTotalTestForm(Form):
+    form_name = "item_total"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            IntegerInput('number_items'),
+        ]
+        test_fields = [
+            IntegerField('total', lambda s, i, v: sum([v[f'item:{n}.amount'] for n in range(i['number_items'])])),
+            IntegerField('largest', lambda s, i, v: max([v[f'item:{n}.amount'] for n in range(i['number_items'])])),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class CycleTestForm(Form):
+    form_name = "cycle"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_fields = [
+            IntegerField('first', lambda s, i, v: v['second']),
+            IntegerField('second', lambda s, i, v: v['first']),
+        ]
+        super().__init__(__class__, [], test_fields, [], **kwargs)
+
+
 class DependencyTrackerTestCase(unittest.TestCase):
     def setUp(self):
         self.form = TestForm()
@@ -95,6 +162,28 @@ class DependencyTrackerTestCase(unittest.TestCase):
         self.assertFalse(self.dep.has_met())
 
 
+    def test_partially_met(self):
+        self.dep.add_unmet('test.bar', self.form.required_fields()[0])
+        self.dep.add_unmet('test.baz', self.form.required_fields()[1])
+        self.dep.meet('test.bar')
+        self.dep.meet('test.bar')
+
+        self.assertTrue(self.dep.has_unmet())
+        self.assertTrue(self.dep.has_met())
+        self.assertTrue(self.dep.is_unmet('test.bar'))
+
+        met_dependent_names = [f.name() for f in self.dep.met_dependents()]
+        self.assertEqual(met_dependent_names, ['test.foo'])
+        self.assertFalse(self.dep.has_met())
+        self.assertFalse(self.dep.is_unmet('test.bar'))
+        self.assertTrue(self.dep.has_unmet())
+
+        discarded = self.dep.discard_dependents({'test.something'})
+        self.assertEqual([f.name() for f in discarded], ['test.something'])
+        self.assertFalse(self.dep.has_unmet())
+        self.assertEqual(self.dep.unmet_dependencies(), [])
+
+
 class SortOrderTestCase(unittest.TestCase):
     def test_sort_keys_same_form(self):
         original = [
@@ -213,6 +302,25 @@ class SortOrderTestCase(unittest.TestCase):
         self.assertListEqual(sorted(original, key=sort_keys), expected)
 
 
+class WorkQueueTestCase(unittest.TestCase):
+    def test_pop_order(self):
+        names = ['1040.10', '1040.829', '1040.1a', '8995.5b', '1040.8a8', '1040.1', 'w-2:1.box_1', 'w-2:0.box_1']
+        queue = WorkQueue()
+        queue.extend(names[:4])
+        popped = [queue.pop()]
+        queue.extend(names[4:])
+
+        while len(queue) > 0:
+            popped.append(queue.pop())
+
+        self.assertListEqual(popped, ['8995.5b', 'w-2:1.box_1', 'w-2:0.box_1', '1040.829', '1040.10', '1040.8a8', '1040.1a', '1040.1'])
+
+    def test_equal_keys_most_recent_first(self):
+        queue = WorkQueue()
+        queue.extend(['test.box12a', 'test.box_12a', 'test.box-12a'])
+        self.assertListEqual([queue.pop() for _ in range(3)], ['test.box-12a', 'test.box_12a', 'test.box12a'])
+
+
 class SolverTestCase(unittest.TestCase):
     def setUp(self):
         self.config = ConfigParser()
@@ -248,3 +356,876 @@ class SolverTestCase(unittest.TestCase):
         self.assertIn('test.something', dep['test.bar'])
 
         self.assertEqual(len(self.solver.unmet_field_dependencies()), 1)
+
+
+class CrossInputTestForm(Form):
+    form_name = "cross_input"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_fields = [
+            IntegerField('bar', lambda s, i, v: i['test.bar']),
+        ]
+        super().__init__(__class__, [], test_fields, [], **kwargs)
+
+
+class StatsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config['test'] = {'bar': '5'}
+        self.config['counting'] = {'a': '1', 'b': '2', 'use_other': 'yes'}
+        CountingTestForm.attempts = {}
+
+    def test_stats(self):
+        s = Solver(InputStore(self.config), [TestForm, CountingTestForm, CrossInputTestForm])
+        self.assertTrue(s.solve(['counting', 'cross_input']))
+        stats = s.stats()
+        self.assertEqual(stats['wasted_attempts'], 2)
+        self.assertEqual(stats['input_spec_retries'], 1)
+        # counting, cross_input, test (input-only first, then re-used)
+        self.assertEqual(stats['forms'], 3)
+        self.assertEqual(stats['fields'], 8)
+        # Every field once, plus the retries
+        self.assertEqual(stats['attempts'], 8 + 2 + 1)
+        self.assertEqual(stats['peak_queue'], 5)
+        self.assertGreaterEqual(stats['iterations'], 1)
+        self.assertGreater(stats['time'], 0)
+
+        pull = PullSolver(InputStore(self.config), [TestForm, CountingTestForm, CrossInputTestForm])
+        self.assertTrue(pull.solve(['counting', 'cross_input']))
+        self.assertEqual(pull.stats()['wasted_attempts'], 0)
+
+
+class IncrementalSolverTestCase(unittest.TestCase):
+    def setUp(self):
+        CountingTestForm.attempts = {}
+        self.config = ConfigParser()
+        self.config['counting'] = {'a': '1', 'b': '2', 'use_other': 'no'}
+        self.config['test'] = {'bar': '5'}
+        self.solver = Solver(InputStore(self.config), [TestForm, CountingTestForm])
+        self.assertTrue(self.solver.solve(['counting']))
+
+    def test_recomputes_only_downstream_fields(self):
+        CountingTestForm.attempts = {}
+        self.solver.update_inputs({'counting.a': '10'})
+        self.assertTrue(self.solver.resolve())
+
+        solution = self.solver.solution()
+        self.assertEqual(solution['counting']['a_double'], '20')
+        self.assertEqual(solution['counting']['b_double'], '4')
+        self.assertEqual(solution['counting']['total'], '24')
+        self.assertEqual(set(CountingTestForm.attempts.keys()), {'a_double', 'total'})
+
+    def test_forms_added_and_discarded(self):
+        self.assertNotIn('test', self.solver.solution())
+
+        self.solver.update_inputs({'counting.use_other': 'yes'})
+        self.assertTrue(self.solver.resolve())
+        solution = self.solver.solution()
+        self.assertEqual(solution['counting']['other'], '5')
+        self.assertIn('test', solution)
+
+        self.solver.update_inputs({'counting.use_other': 'no'})
+        self.assertTrue(self.solver.resolve())
+        solution = self.solver.solution()
+        self.assertEqual(solution['counting']['other'], '0')
+        self.assertNotIn('test', solution)
+
+    def test_removed_input(self):
+        self.solver.update_inputs({'counting.b': None})
+        self.assertFalse(self.solver.resolve())
+        self.assertIn('counting.b', self.solver.unmet_input_dependencies())
+
+        self.solver.update_inputs({'counting.b': '3'})
+        self.assertTrue(self.solver.resolve())
+        self.assertEqual(self.solver.solution()['counting']['total'], '8')
+
+    def test_gating_input_changed_after_incomplete_solve(self):
+        modes = [(Solver, {}), (PullSolver, {}), (Solver, {'record_dependencies': True}),
+                 (Solver, {'collect_dependencies': True})]
+        for solver_class, kwargs in modes:
+            with self.subTest(solver_class=solver_class.__name__, **kwargs):
+                config = ConfigParser()
+                config['counting'] = {'a': '1', 'b': '2', 'use_other': 'yes'}
+                solver = solver_class(InputStore(config), [TestForm, CountingTestForm], **kwargs)
+                self.assertFalse(solver.solve(['counting']))
+                self.assertIn('test.bar', solver.unmet_input_dependencies())
+
+                # counting.other no longer needs test.bar, so must stop waiting
+                # for it
+                solver.update_inputs({'counting.use_other': 'no'})
+                self.assertTrue(solver.resolve())
+                self.assertEqual(solver.unmet_input_dependencies(), {})
+
+                config['counting']['use_other'] = 'no'
+                fresh = solver_class(InputStore(config), [TestForm, CountingTestForm], **kwargs)
+                self.assertTrue(fresh.solve(['counting']))
+                self.assertEqual(solver.solution(), fresh.solution())
+
+    def test_record_dependencies(self):
+        self.solver = Solver(InputStore(self.config), [TestForm, CountingTestForm], record_dependencies=True)
+        self.assertTrue(self.solver.solve(['counting']))
+
+        trace = self.solver.dependency_trace()
+        self.assertEqual(trace['counting.total']['values'], ['counting.a_double', 'counting.b_double'])
+        self.assertEqual(trace['counting.total']['missing'], ['counting.a_double'])
+        self.assertEqual(trace['counting.a_double']['inputs'], ['counting.a'])
+
+        CountingTestForm.attempts = {}
+        self.solver.update_inputs({'counting.a': '10', 'counting.b': '20'})
+        self.assertTrue(self.solver.resolve())
+
+        self.assertEqual(self.solver.solution()['counting']['total'], '60')
+        self.assertEqual(CountingTestForm.attempts, {'a_double': 1, 'b_double': 1, 'total': 1})
+        self.assertEqual(self.solver.stats()['attempts_saved'], 1)
+        self.assertEqual(self.solver.stats()['exceptions_saved'], 2)
+
+
+class GatedTestForm(Form):
+    form_name = "gated"
+    tax_year = 1970
+    choices = enum.make('Gated choices', {'A': 'first', 'B': 'second'})
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            EnumInput('choice', GatedTestForm.choices),
+            IntegerInput('extra'),
+        ]
+        test_fields = [
+            # A placeholder can't tell it is being compared with `is`, so
+            # collecting dependencies can't tell `extra` might not be needed
+            IntegerField('amount', lambda s, i, v: i['extra'] if i['choice'] is not GatedTestForm.choices.A else 1),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class CollectDependenciesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config['item_total'] = {'number_items': '10'}
+        for n in range(10):
+            self.config[f'item:{n}'] = {'amount': str(n * 100)}
+
+    def solve(self, **kwargs):
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm], **kwargs)
+        solved = solver.solve(['item_total'])
+        return solver, solved
+
+    def test_same_solution(self):
+        normal, solved = self.solve()
+        self.assertTrue(solved)
+        collecting, solved = self.solve(collect_dependencies=True)
+        self.assertTrue(solved)
+
+        self.assertEqual(normal.solution(), collecting.solution())
+        self.assertEqual(collecting.solution()['item_total']['total'], '4500')
+        self.assertEqual(collecting.solution()['item_total']['largest'], '900')
+
+    def test_fewer_attempts(self):
+        normal, _ = self.solve()
+        collecting, _ = self.solve(collect_dependencies=True)
+
+        # Each of the two fields is attempted once per instance form in the
+        # normal mode, but only twice when collecting dependencies
+        self.assertEqual(normal.stats()['attempts'], 2 * 11 + 10)
+        self.assertEqual(collecting.stats()['attempts'], 2 * 2 + 10)
+        self.assertEqual(collecting.stats()['attempts_saved'], 2 * 9)
+
+    def test_all_missing_inputs_reported(self):
+        del self.config['item:3']
+        del self.config['item:7']
+        collecting, solved = self.solve(collect_dependencies=True)
+
+        self.assertFalse(solved)
+        dep = collecting.unmet_input_dependencies()
+        self.assertEqual(set(dep.keys()), {'item:3.amount', 'item:7.amount'})
+        self.assertEqual(set(collecting.unmet_field_dependencies()['item:3.amount']), {'item_total.total', 'item_total.largest'})
+
+    def test_is_gated_input(self):
+        for kwargs in [{}, {'collect_dependencies': True}]:
+            s = Solver(InputStore(ConfigParser()), [GatedTestForm], **kwargs)
+            self.assertFalse(s.solve(['gated']))
+            self.assertEqual(list(s.unmet_input_dependencies()), ['gated.choice'])
+
+            asked = []
+            def prompt(missing, needed_by):
+                asked.append(missing.name())
+                return ('A', True)
+            s = Solver(InputStore(ConfigParser()), [GatedTestForm], prompt=prompt, **kwargs)
+            self.assertTrue(s.solve(['gated']))
+            self.assertEqual(asked, ['gated.choice'])
+
+
+class WarmStartTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config['item_total'] = {'number_items': '5'}
+        for n in range(5):
+            self.config[f'item:{n}'] = {'amount': str(n)}
+
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+        self.assertTrue(solver.solve(['item_total']))
+        self.cold_solution = solver.solution()
+        self.cache = solver.dependency_cache()
+
+    def test_warm_start(self):
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+        self.assertTrue(solver.solve(['item_total'], warm_start=self.cache))
+        self.assertEqual(solver.solution(), self.cold_solution)
+        self.assertEqual(solver.stats()['exceptions'], 0)
+        self.assertEqual(solver.stats()['attempts'], 7)
+
+    def test_limits(self):
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+        self.assertFalse(solver.solve(['item_total'], warm_start=self.cache, max_attempts=3))
+        self.assertIsInstance(solver.blocked_by(), SolveLimitExceeded)
+        self.assertEqual(solver.stats()['attempts'], 3)
+        while not solver.resolve():
+            self.assertIsInstance(solver.blocked_by(), SolveLimitExceeded)
+        self.assertEqual(solver.solution(), self.cold_solution)
+
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+        self.assertFalse(solver.solve(['item_total'], warm_start=self.cache, time_budget=0))
+        self.assertEqual(solver.stats()['attempts'], 0)
+
+        reports = []
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+        self.assertTrue(solver.solve(['item_total'], warm_start=self.cache,
+                                     progress=lambda solved, outstanding: reports.append((solved, outstanding))))
+        self.assertEqual(len(reports), solver.stats()['attempts'] + 1)
+
+    def test_different_shape(self):
+        self.config['item_total']['number_items'] = '3'
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+        self.assertTrue(solver.solve(['item_total'], warm_start=self.cache))
+        self.assertEqual(solver.solution()['item_total']['total'], '3')
+        self.assertNotIn('item:3', solver.solution())
+        self.assertGreater(solver.stats()['exceptions'], 0)
+
+    def test_plan_deviation(self):
+        # Fields attempted in the wrong order fall back to normal solving
+        self.cache['fields'].reverse()
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+        self.assertTrue(solver.solve(['item_total'], warm_start=self.cache))
+        self.assertTrue(solver.warm_started())
+        self.assertEqual(solver.solution(), self.cold_solution)
+
+    def test_plan_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            plan_cache = PlanCache(directory)
+            for number_items, warm_started in [('5', False), ('5', True), ('3', False), ('3', True), ('5', True)]:
+                self.config['item_total']['number_items'] = number_items
+                solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+                self.assertTrue(plan_cache.solve(solver, ['item_total']))
+                self.assertEqual(solver.warm_started(), warm_started)
+            self.assertEqual(len(plan_cache.plans(solver.dependency_cache_key(['item_total']))), 2)
+
+    def test_different_forms(self):
+        solver = Solver(InputStore(self.config), [ItemTestForm, ItemTotalTestForm])
+        self.assertTrue(solver.solve(['item:0'], warm_start=self.cache))
+        self.assertEqual(solver.solution().sections(), ['item:0'])
+
+
+class PullSolverTestCase(unittest.TestCase):
+    def setUp(self):
+        CountingTestForm.attempts = {}
+        self.config = ConfigParser()
+        self.config['counting'] = {'a': '1', 'b': '2', 'use_other': 'yes'}
+        self.config['test'] = {'bar': '5'}
+
+    def solve(self, solver_class, form_list, form_names):
+        solver = solver_class(InputStore(self.config), form_list)
+        solved = solver.solve(form_names)
+        return solved, solver
+
+    def test_same_solution(self):
+        solved, solver = self.solve(Solver, [TestForm, CountingTestForm], ['counting'])
+        CountingTestForm.attempts = {}
+        pull_solved, pull_solver = self.solve(PullSolver, [TestForm, CountingTestForm], ['counting'])
+        self.assertTrue(solved)
+        self.assertTrue(pull_solved)
+        self.assertEqual(pull_solver.solution(), solver.solution())
+        self.assertEqual(pull_solver.stats()['exceptions'], 0)
+        self.assertEqual(set(CountingTestForm.attempts.values()), {1})
+
+    def test_missing_input(self):
+        del self.config['counting']['b']
+        solved, solver = self.solve(Solver, [TestForm, CountingTestForm], ['counting'])
+        pull_solved, pull_solver = self.solve(PullSolver, [TestForm, CountingTestForm], ['counting'])
+        self.assertFalse(pull_solved)
+        self.assertEqual(pull_solver.solution(), solver.solution())
+        self.assertEqual(pull_solver.unmet_input_dependencies(), {'counting.b': ['counting.b_double']})
+        self.assertEqual(pull_solver.unmet_field_dependencies(), solver.unmet_field_dependencies())
+
+    def test_cycle(self):
+        pull_solved, pull_solver = self.solve(PullSolver, [CycleTestForm], ['cycle'])
+        self.assertFalse(pull_solved)
+        self.assertEqual(set(pull_solver.unmet_field_dependencies()), {'cycle.first', 'cycle.second'})
+
+
+class QueryTestCase(unittest.TestCase):
+    def setUp(self):
+        CountingTestForm.attempts = {}
+        self.config = ConfigParser()
+        self.config['counting'] = {'a': '1', 'use_other': 'yes'}
+        self.config['test'] = {'bar': '5'}
+
+    def test_query(self):
+        for solver_class in [Solver, PullSolver]:
+            solver = solver_class(InputStore(self.config), [TestForm, CountingTestForm])
+            # 'counting.b' is missing, but isn't needed for these fields
+            self.assertEqual(solver.query(['counting.a_double', 'counting.other']), {'counting.a_double': 2, 'counting.other': 5})
+            self.assertEqual(set(solver.forms.keys()), {'counting', 'test'})
+            self.assertEqual(set(solver.solution()['test'].keys()), {'something'})
+            self.assertEqual(solver.unmet_input_dependencies(), {})
+
+    def test_query_missing_input(self):
+        solver = Solver(InputStore(self.config), [TestForm, CountingTestForm])
+        self.assertEqual(solver.query(['counting.a_double', 'counting.total']), {'counting.a_double': 2})
+        self.assertEqual(solver.unmet_input_dependencies(), {'counting.b': ['counting.b_double']})
+
+
+class LimitTestForm(Form):
+    form_name = "limit"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_fields = [
+            IntegerField('limit', lambda s, i, v: s.form().threshold('limit')),
+        ]
+        super().__init__(__class__, [], test_fields, [], thresholds={'limit': 3}, **kwargs)
+
+
+class CappedTestForm(Form):
+    form_name = "capped"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            IntegerInput('amount'),
+            BooleanInput('capped'),
+        ]
+        test_fields = [
+            IntegerField('amount', lambda s, i, v: min(i['amount'], v['limit.limit'], s.form('limit').threshold('limit')) if i['capped'] else i['amount']),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class ForkTestCase(unittest.TestCase):
+    def setUp(self):
+        CountingTestForm.attempts = {}
+        self.config = ConfigParser()
+        self.config['counting'] = {'a': '1', 'b': '2', 'use_other': 'no'}
+        self.config['test'] = {'bar': '5'}
+        self.solver = Solver(InputStore(self.config), [TestForm, CountingTestForm])
+        self.assertTrue(self.solver.solve(['counting']))
+
+    def test_fork(self):
+        CountingTestForm.attempts = {}
+        forked = self.solver.fork()
+        forked.update_inputs({'counting.a': '10', 'counting.use_other': 'yes'})
+        self.assertTrue(forked.resolve())
+        self.assertEqual(set(CountingTestForm.attempts.keys()), {'a_double', 'total', 'other'})
+
+        solution = forked.solution()
+        self.assertEqual(solution['counting']['total'], '24')
+        self.assertEqual(solution['counting']['other'], '5')
+        self.assertIn('test', forked.forms)
+
+        # The original is unaffected
+        solution = self.solver.solution()
+        self.assertEqual(solution['counting']['total'], '6')
+        self.assertEqual(solution['counting']['other'], '0')
+        self.assertNotIn('test', self.solver.forms)
+        self.assertEqual(self.config['counting']['a'], '1')
+
+    def test_fork_missing_input(self):
+        solver = Solver(InputStore(ConfigParser()), [TestForm, CountingTestForm])
+        self.assertFalse(solver.solve(['counting']))
+        for a in ['1', '2']:
+            forked = solver.fork()
+            forked.update_inputs({'counting.a': a, 'counting.b': '2', 'counting.use_other': 'no'})
+            self.assertTrue(forked.resolve())
+            self.assertEqual(forked.solution()['counting']['a_double'], str(2 * int(a)))
+        self.assertIn('counting.a', solver.unmet_input_dependencies())
+
+    def test_fork_form_lookup(self):
+        config = ConfigParser()
+        config['capped'] = {'amount': '5', 'capped': 'no'}
+        solver = Solver(InputStore(config), [CappedTestForm, LimitTestForm])
+        self.assertTrue(solver.solve(['capped']))
+
+        # Fields of the fork look up other forms (here, one only the fork
+        # adds) in the fork rather than the original
+        forked = solver.fork()
+        forked.update_inputs({'capped.capped': 'yes'})
+        self.assertTrue(forked.resolve())
+        self.assertEqual(forked.solution()['capped']['amount'], '3')
+        self.assertIs(forked.forms['capped'].solver(), forked)
+        self.assertIs(solver.forms['capped'].solver(), solver)
+        self.assertNotIn('limit', solver.forms)
+
+    def test_snapshot(self):
+        snapshot = self.solver.snapshot()
+        self.solver.update_inputs({'counting.b': '3'})
+        self.assertTrue(self.solver.resolve())
+        self.assertEqual(self.solver.solution()['counting']['total'], '8')
+
+        self.solver.restore(snapshot)
+        self.assertEqual(self.solver.solution()['counting']['total'], '6')
+        self.solver.update_inputs({'counting.a': '2'})
+        self.assertTrue(self.solver.resolve())
+        self.assertEqual(self.solver.solution()['counting']['total'], '8')
+        self.assertEqual(snapshot.solution()['counting']['total'], '6')
+        self.assertIs(self.solver.forms['counting'].solver(), self.solver)
+
+
+class SolveSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        CountingTestForm.attempts = {}
+        self.config = ConfigParser()
+        self.config['counting'] = {'a': '1', 'use_other': 'yes'}
+        self.forms = [TestForm, CountingTestForm]
+
+    def test_suspend_and_resume(self):
+        session = Solver(InputStore(self.config), self.forms).solve(['counting'], suspend=True)
+        self.assertIsInstance(session, SolveSession)
+        self.assertEqual(list(session.needed_inputs().keys()), ['counting.b', 'test.bar'])
+        self.assertIsInstance(session.needed_inputs()['test.bar'], IntegerInput)
+
+        CountingTestForm.attempts = {}
+        self.assertIs(session.resume({'counting.b': '2'}), session)
+        self.assertEqual(list(session.needed_inputs().keys()), ['test.bar'])
+        self.assertEqual(CountingTestForm.attempts, {'b_double': 1, 'total': 1})
+
+        self.assertTrue(session.resume({'test.bar': '5'}))
+        self.assertEqual(session.solver.solution()['counting']['other'], '5')
+
+        # Without missing inputs, solve() returns as usual
+        self.assertTrue(Solver(InputStore(self.config), self.forms).solve(['counting'], suspend=True))
+
+    def test_resume_with_changed_input(self):
+        session = Solver(InputStore(self.config), self.forms).solve(['counting'], suspend=True)
+        self.assertEqual(list(session.needed_inputs().keys()), ['counting.b', 'test.bar'])
+
+        # counting.other no longer needs test.bar, so it isn't asked for
+        self.assertTrue(session.resume({'counting.b': '2', 'counting.use_other': 'no'}))
+        solution = session.solver.solution()
+        self.assertEqual(solution['counting']['other'], '0')
+        self.assertNotIn('test', solution)
+
+    def test_save_and_load(self):
+        for solver_class in [Solver, PullSolver]:
+            session = solver_class(InputStore(self.config), self.forms).solve(['counting'], suspend=True)
+            with tempfile.TemporaryDirectory() as directory:
+                session.save(f'{directory}/session.json')
+                loaded = SolveSession.load(f'{directory}/session.json', self.forms)
+            self.assertIsInstance(loaded.solver, solver_class)
+            self.assertEqual(list(loaded.needed_inputs().keys()), ['counting.b', 'test.bar'])
+
+            CountingTestForm.attempts = {}
+            self.assertTrue(loaded.resume({'counting.b': '2', 'test.bar': '5'}))
+            self.assertEqual(CountingTestForm.attempts, {'b_double': 1, 'total': 1, 'other': 1})
+            solution = loaded.solver.solution()
+            self.assertEqual(solution['counting']['total'], '6')
+            self.assertEqual(solution['test']['else'], '0')
+
+    def test_load_mismatched(self):
+        session = Solver(InputStore(self.config), self.forms).solve(['counting'], suspend=True)
+        state = session.to_dict()
+        state['key']['version'] = '0.0.0'
+        with self.assertRaises(ValueError):
+            SolveSession.from_dict(state, self.forms)
+
+
+class AsyncSolverTestCase(unittest.TestCase):
+    def setUp(self):
+        CountingTestForm.attempts = {}
+        self.config = ConfigParser()
+        self.config['counting'] = {'use_other': 'yes'}
+        self.answers = {'counting.a': '1', 'counting.b': '2', 'test.bar': '5'}
+        self.prompted = []
+        self.waiting = 0
+        self.most_waiting = 0
+
+    async def prompt(self, missing, needed_by):
+        self.prompted.append(missing.name())
+        self.waiting += 1
+        self.most_waiting = max(self.most_waiting, self.waiting)
+        # Answer later prompts first
+        await asyncio.sleep(0.01 * (3 - len(self.prompted)))
+        self.waiting -= 1
+        return self.answers.get(missing.name()), missing.name() in self.answers
+
+    def solve(self, **kwargs):
+        solver = AsyncSolver(InputStore(self.config), [TestForm, CountingTestForm], prompt=self.prompt, **kwargs)
+        return solver, asyncio.run(solver.solve(['counting']))
+
+    def test_concurrent_prompts(self):
+        solver, solved = self.solve()
+        self.assertTrue(solved)
+        self.assertEqual(self.prompted, ['counting.a', 'counting.b', 'test.bar'])
+        self.assertEqual(self.most_waiting, 3)
+        solution = solver.solution()
+        self.assertEqual(solution['counting']['total'], '6')
+        self.assertEqual(solution['counting']['other'], '5')
+
+    def test_max_prompts(self):
+        solver, solved = self.solve(max_prompts=1)
+        self.assertTrue(solved)
+        self.assertEqual(sorted(self.prompted), ['counting.a', 'counting.b', 'test.bar'])
+        self.assertEqual(self.most_waiting, 1)
+
+    def test_refused(self):
+        del self.answers['counting.b']
+        solver, solved = self.solve()
+        self.assertFalse(solved)
+        self.assertEqual(list(solver.unmet_input_dependencies().keys()), ['counting.b'])
+        self.assertEqual(solver.solution()['counting']['a_double'], '2')
+
+    def test_resolve(self):
+        solver, solved = self.solve()
+        solver.update_inputs({'counting.a': None})
+        self.prompted = []
+        self.answers['counting.a'] = '3'
+        self.assertTrue(asyncio.run(solver.resolve()))
+        self.assertEqual(self.prompted, ['counting.a'])
+        self.assertEqual(solver.solution()['counting']['total'], '10')
+
+
+class BatchPromptTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config['counting'] = {'use_other': 'yes'}
+        self.answers = {'counting.a': '1', 'counting.b': '2', 'test.bar': '5'}
+        self.batches = []
+
+    def batch_prompt(self, missing):
+        names = [i.name() for i, needed_by in missing]
+        self.batches.append(names)
+        for i, needed_by in missing:
+            self.assertTrue(len(needed_by) > 0)
+        return {name: self.answers[name] for name in names if name in self.answers}
+
+    def test_batch_prompt(self):
+        for solver_class in [Solver, PullSolver]:
+            self.batches = []
+            config = ConfigParser()
+            config.read_dict(self.config)
+            s = solver_class(InputStore(config), [TestForm, CountingTestForm], batch_prompt=self.batch_prompt)
+            self.assertTrue(s.solve(['counting']))
+            self.assertEqual(self.batches, [['counting.a', 'counting.b', 'test.bar']])
+            self.assertEqual(s.stats()['prompts'], 1)
+            self.assertEqual(s.solution()['counting']['other'], '5')
+
+    def test_declined(self):
+        del self.answers['counting.b']
+        s = Solver(InputStore(self.config), [TestForm, CountingTestForm], batch_prompt=self.batch_prompt)
+        self.assertFalse(s.solve(['counting']))
+        # Declined inputs are not asked for again
+        self.assertEqual(self.batches, [['counting.a', 'counting.b', 'test.bar']])
+        self.assertEqual(list(s.unmet_input_dependencies().keys()), ['counting.b'])
+
+        self.answers['counting.b'] = '2'
+        s.update_inputs({'counting.a': None})
+        self.assertTrue(s.resolve())
+        self.assertEqual(self.batches[1], ['counting.a', 'counting.b'])
+
+    def test_declined_in_fork(self):
+        self.config['counting'] = {'a': '1', 'b': '2', 'use_other': 'no'}
+        del self.answers['test.bar']
+        s = Solver(InputStore(self.config), [TestForm, CountingTestForm], batch_prompt=self.batch_prompt)
+        self.assertTrue(s.solve(['counting']))
+        forked = s.fork()
+
+        # An input declined by one solver is still asked for by the other
+        self.assertEqual(s.query(['test.foo']), {})
+        self.answers['test.bar'] = '5'
+        self.assertEqual(forked.query(['test.foo']), {'test.foo': 5})
+        self.assertEqual(self.batches, [['test.bar'], ['test.bar']])
+
+    def test_invalid(self):
+        self.answers['counting.a'] = 'one'
+        s = Solver(InputStore(self.config), [TestForm, CountingTestForm], batch_prompt=self.batch_prompt)
+        with self.assertRaises(InvalidInput):
+            s.solve(['counting'])
+
+
+class UnimplementedTestForm(Form):
+    form_name = "unimplemented"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_fields = [
+            IntegerField('a', lambda s, i, v: 1),
+            IntegerField('b', lambda s, i, v: s.not_implemented()),
+            IntegerField('c', lambda s, i, v: v['test.else']),
+        ]
+        super().__init__(__class__, [], test_fields, [], **kwargs)
+
+
+class FailFastTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config['test'] = {'bar': '5'}
+
+    def test_unimplemented(self):
+        s = Solver(InputStore(self.config), [TestForm, UnimplementedTestForm])
+        self.assertFalse(s.solve(['unimplemented'], fail_fast=True))
+        self.assertIsInstance(s.blocked_by(), FieldNotImplemented)
+        self.assertEqual(s.blocked_by().field_name, 'unimplemented.b')
+        self.assertEqual(s.unimplemented_fields(), ['unimplemented.b'])
+        attempts = s.stats()['attempts']
+
+        s = Solver(InputStore(self.config), [TestForm, UnimplementedTestForm])
+        self.assertFalse(s.solve(['unimplemented']))
+        self.assertIsNone(s.blocked_by())
+        self.assertGreater(s.stats()['attempts'], attempts)
+
+    def test_missing_input(self):
+        for solver_class in [Solver, PullSolver]:
+            s = solver_class(InputStore(ConfigParser()), [TestForm])
+            self.assertFalse(s.solve(['test'], fail_fast=True))
+            self.assertIsInstance(s.blocked_by(), MissingInput)
+            self.assertEqual(s.blocked_by().input_name, 'test.bar')
+            self.assertEqual(list(s.unmet_input_dependencies().keys()), ['test.bar'])
+            self.assertEqual(s.stats()['attempts'], 1)
+
+    def test_refused_input(self):
+        prompted = []
+        def prompt(missing, needed_by):
+            prompted.append(missing.name())
+            return None, False
+        s = Solver(InputStore(ConfigParser()), [TestForm, CountingTestForm], prompt=prompt)
+        self.assertFalse(s.solve(['counting'], fail_fast=True))
+        self.assertEqual(prompted, ['counting.a'])
+        self.assertEqual(s.blocked_by().input_name, 'counting.a')
+
+    def test_resolve(self):
+        s = Solver(InputStore(ConfigParser()), [TestForm])
+        self.assertFalse(s.solve(['test'], fail_fast=True))
+        s.update_inputs({'test.bar': '5'})
+        self.assertTrue(s.resolve())
+        self.assertIsNone(s.blocked_by())
+        self.assertEqual(s.solution()['test']['else'], '0')
+
+
+class LivelockTestForm(Form):
+    form_name = "livelock"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_fields = [
+            # Reads an input no form specifies, so adding its form never helps
+            IntegerField('a', lambda s, i, v: i['livelock.unspecified']),
+        ]
+        super().__init__(__class__, [], test_fields, [], **kwargs)
+
+
+class SolveLimitsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config['test'] = {'bar': '5'}
+        self.config['counting'] = {'a': '1', 'b': '2', 'use_other': 'yes'}
+        self.form_list = [TestForm, CountingTestForm]
+
+    def test_max_attempts(self):
+        full = Solver(InputStore(self.config), self.form_list)
+        self.assertTrue(full.solve(['counting']))
+
+        for solver_class in [Solver, PullSolver]:
+            s = solver_class(InputStore(self.config), self.form_list)
+            self.assertFalse(s.solve(['counting'], max_attempts=2))
+            self.assertIsInstance(s.blocked_by(), SolveLimitExceeded)
+            self.assertEqual(s.stats()['attempts'], 2)
+
+            # Each resolve() gets a fresh budget, and continues where the
+            # last one stopped
+            while not s.resolve():
+                self.assertIsInstance(s.blocked_by(), SolveLimitExceeded)
+            self.assertIsNone(s.blocked_by())
+            self.assertEqual(s.solution(), full.solution())
+
+    def test_state_after_stopping(self):
+        for solver_class in [Solver, PullSolver]:
+            full = solver_class(InputStore(self.config), self.form_list)
+            self.assertTrue(full.solve(['counting']))
+            for max_attempts in range(full.stats()['attempts']):
+                with self.subTest(solver_class=solver_class.__name__, max_attempts=max_attempts):
+                    s = solver_class(InputStore(self.config), self.form_list)
+                    self.assertFalse(s.solve(['counting'], max_attempts=max_attempts))
+
+                    # The fields still to be attempted are saved, so the
+                    # loaded solver can finish solving
+                    loaded = Solver.from_state(s.to_state(), self.form_list)
+                    self.assertIsInstance(loaded, solver_class)
+                    self.assertTrue(loaded.resolve())
+                    self.assertEqual(loaded.solution(), full.solution())
+
+    def test_time_budget(self):
+        s = Solver(InputStore(self.config), self.form_list)
+        self.assertFalse(s.solve(['counting'], time_budget=0))
+        self.assertIsInstance(s.blocked_by(), SolveLimitExceeded)
+        self.assertEqual(s.stats()['attempts'], 0)
+
+        s = Solver(InputStore(self.config), self.form_list)
+        self.assertTrue(s.solve(['counting'], time_budget=60))
+
+    def test_progress(self):
+        reports = []
+        s = Solver(InputStore(self.config), self.form_list)
+        self.assertTrue(s.solve(['counting'], progress=lambda solved, outstanding: reports.append((solved, outstanding))))
+        self.assertEqual(len(reports), s.stats()['attempts'] + 1)
+        self.assertEqual(reports[0], (0, 4))
+        self.assertEqual(reports[-1][1], 0)
+
+    def test_livelock(self):
+        s = Solver(InputStore(ConfigParser()), [LivelockTestForm])
+        self.assertFalse(s.solve(['livelock'], max_retries=5))
+        self.assertIsInstance(s.blocked_by(), Livelock)
+        self.assertEqual(s.blocked_by().field_name, 'livelock.a')
+        self.assertEqual(s.stats()['attempts'], 6)
+
+    def test_no_livelock(self):
+        # Re-attempting fields as their dependencies are met isn't livelock
+        s = Solver(InputStore(self.config), self.form_list)
+        self.assertTrue(s.solve(['counting'], max_retries=0))
+
+
+class RecordingObserver(SolverObserver):
+    def __init__(self):
+        self.events = []
+
+    def form_added(self, form_name):
+        self.events.append(('form_added', form_name))
+
+    def field_solved(self, field_name, value):
+        self.events.append(('field_solved', field_name, value))
+
+    def field_blocked(self, field_name, dependency):
+        self.events.append(('field_blocked', field_name, dependency))
+
+    def field_unimplemented(self, field_name, message):
+        self.events.append(('field_unimplemented', field_name))
+
+    def input_requested(self, input_name, needed_by):
+        self.events.append(('input_requested', input_name, sorted(needed_by)))
+
+
+class ObserverTestCase(unittest.TestCase):
+    def test_events(self):
+        def prompt(missing, needed_by):
+            return '5', True
+        s = Solver(InputStore(ConfigParser()), [TestForm], prompt=prompt)
+        observer = RecordingObserver()
+        s.add_observer(observer)
+        self.assertTrue(s.solve(['test']))
+        self.assertEqual(observer.events[0], ('form_added', 'test'))
+        self.assertIn(('field_blocked', 'test.foo', 'test.bar'), observer.events)
+        self.assertIn(('input_requested', 'test.bar', ['test.foo', 'test.something']), observer.events)
+        solved = [e for e in observer.events if e[0] == 'field_solved']
+        self.assertEqual(sorted(solved), [('field_solved', 'test.else', 0),
+                                          ('field_solved', 'test.foo', 5),
+                                          ('field_solved', 'test.something', 5)])
+        # Each field is only reported solved once its dependencies are
+        self.assertLess(observer.events.index(('field_solved', 'test.something', 5)),
+                        observer.events.index(('field_solved', 'test.else', 0)))
+
+    def test_unimplemented(self):
+        config = ConfigParser()
+        config['test'] = {'bar': '5'}
+        s = Solver(InputStore(config), [TestForm, UnimplementedTestForm])
+        observer = RecordingObserver()
+        s.add_observer(observer)
+        self.assertFalse(s.solve(['unimplemented']))
+        self.assertIn(('field_unimplemented', 'unimplemented.b'), observer.events)
+        self.assertIn(('form_added', 'test'), observer.events)
+
+    def test_fork(self):
+        config = ConfigParser()
+        config['test'] = {'bar': '5'}
+        s = Solver(InputStore(config), [TestForm])
+        self.assertTrue(s.solve(['test']))
+        forked = s.fork()
+        observer = RecordingObserver()
+        forked.add_observer(observer)
+        forked.update_inputs({'test.bar': '6'})
+        self.assertTrue(forked.resolve())
+        s.update_inputs({'test.bar': '7'})
+        self.assertTrue(s.resolve())
+        self.assertEqual(sorted(observer.events), [('field_solved', 'test.else', 0),
+                                                   ('field_solved', 'test.foo', 6),
+                                                   ('field_solved', 'test.something', 6)])
+
+
+class SharedSpecTestForm(InputForm):
+    form_name = "shared"
+    tax_year = 1970
+    valid_instances = ['you', 'spouse']
+    inits = 0
+
+    def __init__(self, **kwargs):
+        SharedSpecTestForm.inits += 1
+        whose = 'your' if kwargs['instance'] == 'you' else "your spouse's"
+        test_inputs = [
+            EnumInput('choice', enum.make('Shared choices', {'A': 'first', 'B': 'second'})),
+            IntegerInput('amount', description=f'What is {whose} amount?'),
+        ]
+        super().__init__(__class__, test_inputs, **kwargs)
+
+
+class LabelledField(IntegerField):
+    def __init__(self, name, value_fn, label):
+        self.label = label
+        super().__init__(name, value_fn)
+
+
+class LabelledTestForm(Form):
+    form_name = "labelled"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_fields = [
+            LabelledField('one', lambda s, i, v: 1, 'The first'),
+        ]
+        super().__init__(__class__, [], test_fields, [], **kwargs)
+
+
+class FormCreateTestCase(unittest.TestCase):
+    def test_shared(self):
+        SharedSpecTestForm.inits = 0
+        first = SharedSpecTestForm.create(instance='you')
+        second = SharedSpecTestForm.create(instance='you')
+        spouse = SharedSpecTestForm.create(instance='spouse')
+        self.assertEqual(SharedSpecTestForm.inits, 2)
+
+        self.assertEqual([i.name() for i in first.inputs()], ['shared:you.choice', 'shared:you.amount'])
+        self.assertEqual([f.name() for f in spouse.fields()], ['shared:spouse.choice', 'shared:spouse.amount'])
+        self.assertIsNot(first.inputs()[0], second.inputs()[0])
+        self.assertIs(first.inputs()[0].form(), first)
+        self.assertIs(first.fields()[0].form(), first)
+        self.assertIs(first.inputs()[0].enum, second.inputs()[0].enum)
+        # Specs are shared only between the same instance of forms which list
+        # their valid instances
+        self.assertEqual(first.inputs()[1].help(), 'What is your amount?')
+        self.assertEqual(spouse.inputs()[1].help(), "What is your spouse's amount?")
+
+    def test_slots(self):
+        form = SharedSpecTestForm.create(instance='you')
+        for obj in form.inputs() + form.fields():
+            self.assertFalse(hasattr(obj, '__dict__'))
+        # Subclasses which don't declare __slots__ still have their other
+        # attributes copied
+        labelled = LabelledTestForm.create(instance='0')
+        self.assertEqual(labelled.fields()[0].label, 'The first')
+        self.assertEqual(labelled.fields()[0].name(), 'labelled:0.one')
+
+    def test_solve(self):
+        config = ConfigParser()
+        config['item_total'] = {'number_items': '3'}
+        for n in range(3):
+            config[f'item:{n}'] = {'amount': str(n + 1)}
+        s = Solver(InputStore(config), [ItemTestForm, ItemTotalTestForm])
+        self.assertTrue(s.solve(['item_total']))
+        self.assertEqual(s.solution()['item_total']['total'], '6')
+        self.assertEqual(s.solution()['item:2']['amount'], '3')
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+from configparser import ConfigParser
+
+from habutax.inputs import *
+from habutax.fields import *
+from habutax.form import *
+from habutax.solver import Solver, PullSolver
+from habutax.tracing import Tracer
+
+
+class TracedTestForm(Form):
+    form_name = "traced"
+    tax_year = 1970
+
+    def __init__(self, **kwargs):
+        test_inputs = [
+            IntegerInput('a'),
+        ]
+        test_fields = [
+            IntegerField('total', lambda s, i, v: v['double'] + 1),
+            IntegerField('double', lambda s, i, v: 2 * i['a']),
+        ]
+        super().__init__(__class__, test_inputs, test_fields, [], **kwargs)
+
+
+class TracerTestCase(unittest.TestCase):
+    def solve(self, solver_class):
+        tracer = Tracer()
+        s = solver_class(InputStore(ConfigParser()), [TracedTestForm], prompt=lambda missing, needed_by: ('3', True))
+        tracer.attach(s)
+        self.assertTrue(s.solve(['traced']))
+        return tracer
+
+    def test_retry(self):
+        events = self.solve(Solver).events()
+        self.assertEqual([(e['cat'], e['name']) for e in events], [
+            ('form', 'traced'),
+            ('field', 'traced.total'),
+            ('field', 'traced.double'),
+            ('prompt', 'traced.a'),
+            ('field', 'traced.double'),
+            ('field', 'traced.total'),
+        ])
+        self.assertEqual(events[1]['args'], {'waiting_for': ['traced.double']})
+        self.assertEqual(events[2]['args'], {'waiting_for': ['traced.a']})
+        self.assertEqual(events[4]['args'], {'solved': True})
+        for event in events:
+            self.assertEqual(event['ph'], 'X')
+            self.assertGreaterEqual(event['dur'], 0)
+
+    def test_pull(self):
+        events = self.solve(PullSolver).events()
+        # Spans are recorded as they end, so the pulled field's attempt comes
+        # first, but is nested within the attempt which pulled it
+        self.assertEqual([e['name'] for e in events[1:3]], ['traced.double', 'traced.total'])
+        double, total = events[1:3]
+        self.assertGreaterEqual(double['ts'], total['ts'])
+        self.assertLessEqual(double['ts'] + double['dur'], total['ts'] + total['dur'])
+
+    def test_write(self):
+        tracer = self.solve(Solver)
+        with tracer.span('after', 'test', detail=1):
+            pass
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'trace.json')
+            tracer.write(filename)
+            with open(filename) as infile:
+                trace = json.load(infile)
+        self.assertEqual(len(trace['traceEvents']), 7)
+        self.assertEqual(trace['traceEvents'][-1]['args'], {'detail': 1})